@@ -0,0 +1,67 @@
+"""
+Command line entry point, run with `python -m langauge`:
+
+python -m langauge list                                 lists every discovered demo
+python -m langauge run                                  runs the default demos of langauge/main.py
+python -m langauge run threads.locks oop.oop --jobs 4   runs the named demos, 4 at a time, each in its own process
+python -m langauge run threads.rw_lock --benchmark -j 1 also runs the benchmark() of the named demos
+"""
+import argparse
+import sys
+import time
+
+from langauge import demos, runner
+
+
+def list_demos(args):
+    for demo in demos.registry().values():
+        summary = (demo.doc or '').strip().split('\n')[0]
+        print('{:<45} {}'.format(demo.name, summary))
+    return 0
+
+
+def run_demos(args):
+    names = args.names
+    if not names:
+        from langauge.main import DEFAULT_DEMOS
+        names = DEFAULT_DEMOS
+
+    for name in names:
+        try:
+            demos.get(name)
+        except KeyError as e:
+            print(e.args[0], file=sys.stderr)
+            return 2
+
+    start = time.perf_counter()
+    results = runner.run_demos(names, jobs=args.jobs, timeout=args.timeout,
+                               on_result=None if args.quiet else runner.print_output, benchmark=args.benchmark)
+    runner.print_summary(results, time.perf_counter() - start)
+
+    return 0 if all(result.status == 'ok' for result in results) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m langauge', description='Run the demos of the langauge package')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    list_parser = commands.add_parser('list', help='list the available demos')
+    list_parser.set_defaults(func=list_demos)
+
+    run_parser = commands.add_parser('run', help='run demos in parallel, each in its own process')
+    run_parser.add_argument('names', nargs='*', help='demos to run (default: the demos run by langauge/main.py)')
+    run_parser.add_argument('-j', '--jobs', type=int, default=None, help='demos to run at once (default: CPU count)')
+    run_parser.add_argument('-t', '--timeout', type=float, default=None, help='seconds before a demo is killed')
+    run_parser.add_argument('-q', '--quiet', action='store_true', help='only print the summary table')
+    run_parser.add_argument('-b', '--benchmark', action='store_true',
+                            help='also run the benchmark() of the demo modules defining one (slow, run with -j 1 for '
+                                 'comparable numbers)')
+    run_parser.set_defaults(func=run_demos)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
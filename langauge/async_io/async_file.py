@@ -0,0 +1,264 @@
+"""
+Async file I/O - `async with open_async(path) as file:` without blocking the event loop.
+
+Operating systems offer no portable non-blocking API for regular files: a read() of a file on disk always blocks the
+calling thread. asyncio's answer is run_in_executor() (see run_in_executor.py): the blocking call runs in a thread
+while the loop keeps serving other tasks. This module wraps that pattern into a file object:
+
+*   every blocking call (open, read, write, flush, close) runs in a small thread pool dedicated to file I/O, so file
+    access can never starve the default executor used by everything else, nor the other way around
+*   read-ahead: reads are made in large blocks, and as soon as one block arrives the next one is requested in the
+    background, so the next block is usually ready by the time the current one has been consumed. readline() and
+    `async for line in file` are then served from memory, without a thread hop per line. Lines served from one block
+    run without giving the loop a chance to switch tasks, which is why blocks default to a moderate 64 KiB
+*   write coalescing: small write() calls are collected in memory and handed to a thread as one large write when
+    `write_buffer` characters (or bytes) have accumulated, and on flush() / close()
+
+Read-ahead is only used for files opened read-only; files opened for writing (or both) read on demand.
+
+Example:
+
+async with open_async('data/data.txt') as file:
+    async for line in file:
+        print(line, end='')
+"""
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langauge.data_types.streaming_reader import generate_file
+
+_executor = None
+
+
+def get_executor():
+    """The thread pool shared by all async files, created on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='async_file')
+    return _executor
+
+
+class AsyncFile:
+    def __init__(self, file, executor, read_ahead=64 * 1024, write_buffer=64 * 1024):
+        self._file = file
+        self._executor = executor
+        self.read_ahead = read_ahead
+        self.write_buffer = write_buffer
+        self._empty = b'' if 'b' in file.mode else ''
+        self._prefetching = file.readable() and not file.writable()
+
+        self._buffer = self._empty
+        self._position = 0          # start of the unread data in _buffer
+        self._next_block = None     # future of the block being read ahead
+        self._eof = False
+
+        self._writes = []
+        self._written = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _request_block(self):
+        if self._next_block is None and not self._eof:
+            self._next_block = self._run(self._file.read, self.read_ahead)
+
+    async def _fill(self):
+        """Replace the buffer, consumed by now, with the next block, returning False at the end of the file"""
+        if self._writes:
+            await self.flush()
+        self._request_block()
+        if self._next_block is None:
+            return False
+        block = await self._next_block
+        self._next_block = None
+        if not block:
+            self._eof = True
+            return False
+
+        self._buffer = block
+        self._position = 0
+        if self._prefetching:
+            self._request_block()
+        return True
+
+    def _take(self, end):
+        data = self._buffer[self._position:end]
+        self._position = end
+        return data
+
+    # the pieces of data spanning several blocks are collected in a list and joined once: appending each block to the
+    # previous ones instead would copy the data read so far again for every block, quadratic for large reads
+
+    async def readline(self):
+        newline = '\n' if isinstance(self._empty, str) else b'\n'
+        parts = []
+        while True:
+            end = self._buffer.find(newline, self._position)
+            if end != -1:
+                parts.append(self._take(end + 1))
+                break
+            parts.append(self._take(len(self._buffer)))
+            if not await self._fill():
+                break
+        return parts[0] if len(parts) == 1 else self._empty.join(parts)
+
+    async def read(self, size=-1):
+        parts = []
+        if size is None or size < 0:
+            parts.append(self._take(len(self._buffer)))
+            while await self._fill():
+                parts.append(self._take(len(self._buffer)))
+            return self._empty.join(parts)
+
+        while True:
+            available = len(self._buffer) - self._position
+            if available >= size:
+                parts.append(self._take(self._position + size))
+                break
+            parts.append(self._take(len(self._buffer)))
+            size -= available
+            if not await self._fill():
+                break
+        return self._empty.join(parts)
+
+    async def write(self, data):
+        self._writes.append(data)
+        self._written += len(data)
+        if self._written >= self.write_buffer:
+            await self._write_out()
+        return len(data)
+
+    async def _write_out(self):
+        if self._writes:
+            data, self._writes, self._written = self._empty.join(self._writes), [], 0
+            await self._run(self._file.write, data)
+
+    async def flush(self):
+        await self._write_out()
+        await self._run(self._file.flush)
+
+    async def close(self):
+        if self._file.closed:
+            return
+        try:
+            await self._write_out()
+            if self._next_block is not None:
+                # the thread may still be reading: let it finish before the file is closed under it
+                await asyncio.gather(self._next_block, return_exceptions=True)
+                self._next_block = None
+        finally:
+            await self._run(self._file.close)
+
+
+class _Opener:
+    """What open_async() returns: usable both as `await open_async(...)` and `async with open_async(...)`"""
+
+    def __init__(self, args, kwargs, read_ahead, write_buffer, executor):
+        self._args, self._kwargs = args, kwargs
+        self._options = read_ahead, write_buffer
+        self._executor = executor or get_executor()
+        self._file = None
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        file = await loop.run_in_executor(self._executor, lambda: open(*self._args, **self._kwargs))
+        return AsyncFile(file, self._executor, *self._options)
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def __aenter__(self):
+        self._file = await self._open()
+        return self._file
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._file.close()
+
+
+def open_async(*args, read_ahead=64 * 1024, write_buffer=64 * 1024, executor=None, **kwargs):
+    """Same arguments as the built-in open(), plus the read-ahead and write buffer sizes"""
+    return _Opener(args, kwargs, read_ahead, write_buffer, executor)
+
+
+# ----- Loop responsiveness benchmark
+
+async def _sample_lag(lags, interval=0.001):
+    """Record how late the loop wakes this task up, compared to when it asked to be woken up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+
+async def _measure(read):
+    lags = []
+    sampler = asyncio.ensure_future(_sample_lag(lags))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    lines = await read()
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.01)       # let the sampler record its last (possibly very late) wake up
+    sampler.cancel()
+    lags.sort()
+    return lines, elapsed, lags[int(len(lags) * 0.99)] if lags else 0.0, lags[-1] if lags else 0.0
+
+
+def benchmark(size_mb=128):
+    path = os.path.join(tempfile.gettempdir(), 'async_file_benchmark.txt')
+    generate_file(path, size_mb)
+
+    async def blocking_read():
+        with open(path, encoding='utf-8') as file:      # blocks the loop for the whole file
+            return sum(1 for _ in file)
+
+    async def async_read():
+        lines = 0
+        async with open_async(path, encoding='utf-8') as file:
+            async for _ in file:
+                lines += 1
+        return lines
+
+    print('Reading the lines of a {} MB file while sampling the event loop lag every 1 ms'.format(size_mb))
+    try:
+        for name, read in [('blocking open()', blocking_read), ('open_async()', async_read)]:
+            lines, elapsed, p99, worst = asyncio.run(_measure(read))
+            print('{:<16} {} lines in {:.2f}s, loop lag p99 {:.1f} ms, max {:.1f} ms'.format(
+                name, lines, elapsed, p99 * 1000, worst * 1000))
+    finally:
+        os.remove(path)
+
+
+def demo():
+    path = os.path.join(tempfile.gettempdir(), 'async_file_demo.txt')
+
+    async def main():
+        async with open_async(path, 'w', encoding='utf-8', write_buffer=16) as file:
+            for i in range(5):
+                await file.write('line {}\n'.format(i))     # coalesced, a thread is only used every 16 characters
+
+        async with open_async(path, encoding='utf-8', read_ahead=8) as file:
+            print(repr(await file.readline()), repr(await file.read(3)))
+            async for line in file:
+                print(line, end='')
+
+    asyncio.run(main())
+    os.remove(path)
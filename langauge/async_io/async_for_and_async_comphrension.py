@@ -13,23 +13,28 @@ the iteration itself is performing I/O. The benefit is that you can process enor
 loop, because you have to deal with each chunk only in tiny batches """
 import asyncio
 
-import requests
+from langauge.async_io.http_client import HttpClient
+from langauge.async_io.prefetch import Prefetcher
+from langauge.async_io.stream import abatch, afilter, amap, amerge, atake
 
 
 class AsyncIterationProtocol:
     def __aiter__(self):
         self.urls = iter(['https://www.google.com/', 'https://www.bing.com/'])
+        self.client = HttpClient()
         return self
 
     async def __anext__(self):
         try:
             url = next(self.urls)
         except StopIteration:
+            await self.client.close()
             raise StopAsyncIteration
 
-        loop = asyncio.get_running_loop()
         # We can await the data, which means that other code can run on the event loop while we wait on network I/O.
-        result = await loop.run_in_executor(None, requests.get, url)
+        # The request is made with asyncio streams rather than a blocking requests.get() in an executor thread, see
+        # langauge/async_io/http_client.py
+        result = await self.client.get(url)
         return result.status_code
 
 
@@ -75,6 +80,37 @@ async def async_for_comphrension_demo():
     print('results = ', results)
 
 
+async def prefetch_demo():
+    """The async for loops above are serialized: each item is awaited only once the previous one has been consumed.
+    Prefetcher (see langauge/async_io/prefetch.py) keeps a window of them in flight instead."""
+    async with HttpClient() as client:
+        async for response in Prefetcher(['https://www.google.com/', 'https://www.bing.com/'], client.get, window=2):
+            print(response.status_code)
+
+    # reads doubler() ahead of the consumer, up to 2 items
+    result = [x async for x in Prefetcher(doubler(3), window=2)]
+    print(result)
+
+    # awaits up to 3 of the f(x) coroutines produced by factory() at once, yielding them as they finish
+    results = [r async for r in Prefetcher(factory(3), lambda item: item[0](item[1]), window=3, ordered=False)]
+    print('results = ', results)
+
+
+async def stream_demo():
+    """The same generators through a pipeline of stages (see langauge/async_io/stream.py), which never builds a list
+    of the whole stream: each stage only pulls an item when the next one asks for it."""
+    print([pair async for pair in afilter(lambda pair: pair[0] % 2 == 0, doubler(5))])
+
+    # up to 3 of the f(x) coroutines in flight at once, results in the order of factory()
+    print([x async for x in amap(lambda item: item[0](item[1]), factory(5), concurrency=3)])
+
+    print([batch async for batch in abatch(doubler(5), size=2, timeout=0.15)])
+    calls = amap(lambda item: item[0](item[1]), factory(3), concurrency=3)
+    print([item async for item in atake(amerge(doubler(3), calls), 4)])
+
+
 def demo():
     asyncio.run(demo_async_for())
     asyncio.run(async_for_comphrension_demo())
+    asyncio.run(prefetch_demo())
+    asyncio.run(stream_demo())
@@ -1,6 +1,8 @@
 import asyncio
 import time
 
+from langauge.async_io.loop_factory import new_event_loop
+
 
 async def main():
     print(f'{time.ctime()} Hello!')
@@ -54,7 +56,8 @@ def demo():
     # event loop every time you call it.
     loop.close()
 
-    # If you use asyncio.run() (see example 1), none of these steps are necessary: they are all done for you.
+    # If you use asyncio.run() (see example 1), none of these steps are necessary: they are all done for you. And tasks
+    # spawned in a TaskGroup (see task_group.py) are all done before the group exits, so there is nothing left to cancel.
 
     # --------- Example 3 ---------
 
@@ -62,8 +65,7 @@ def demo():
         time.sleep(0.5)
         print(f"{time.ctime()} Hello from a thread!")
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    loop = new_event_loop()         # a new loop, set as the current one, of the kind picked in loop_factory.py
 
     task = loop.create_task(main())
 
@@ -83,8 +85,7 @@ def demo():
         await asyncio.sleep(1 / delay)
         return delay
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    loop = new_event_loop()
 
     for i in range(10):
         loop.create_task(f(i))
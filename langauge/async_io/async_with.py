@@ -35,8 +35,29 @@ async with web_page('google.com') as data:
 
 Just because you’re using asyncio in your program, that doesn’t mean that all your context managers must be async
 ones like these. They’re useful only if you need to await something inside the enter and exit methods. If there is no
-blocking I/O code, just use regular context managers. """
+blocking I/O code, just use regular context managers.
+
+connection_pool.py turns the Connection sketch above into a working class, and adds a pool of them:
+`async with pool.acquire() as conn:` borrows an open connection for the block and gives it back on the way out. """
+import asyncio
+
+from langauge.async_io.connection_pool import AsyncConnectionPool, Connection, start_echo_server
 
 
 def demo():
     print('Read pydoc in the source file')
+
+    async def main():
+        server, port = await start_echo_server()
+
+        async with Connection('127.0.0.1', port) as conn:
+            print(await conn.request(b'one connection, opened and closed by async with'))
+
+        async with AsyncConnectionPool(lambda: Connection('127.0.0.1', port).open(), max_size=2) as pool:
+            async with pool.acquire() as conn:
+                print(await conn.request(b'a connection borrowed from the pool'))
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
@@ -0,0 +1,258 @@
+"""
+Broadcast futures and batched resolution - completing futures with fewer trips through the event loop.
+
+An asyncio.Future does not run its callbacks itself: set_result() hands each done callback to loop.call_soon(), one
+Handle (and one copy of the context) per callback, and the loop runs them one by one on its next iteration. That is
+cheap for a few callbacks, and it adds up when thousands of callbacks hang on the same result, or when thousands of
+small results arrive together:
+
+*   BroadcastFuture keeps its callbacks in a plain list. set_result() schedules a single loop callback, which runs all
+    of them in a row. Tasks awaiting the future still need one wake up each (a task only runs when the loop steps it),
+    but those are issued from that same single callback. Each awaiting task also costs a small future of its own, so
+    for tasks awaiting one result a plain asyncio.Future is just as good: the savings are on callbacks and batches
+*   set_results([(future, result), ...]) completes many futures in one scheduling pass: every BroadcastFuture in the
+    batch is marked done at once, and all of their callbacks run from one loop callback. Plain asyncio futures in the
+    batch are completed with their own set_result()
+*   set_results_threadsafe(loop, pairs) does the same from another thread (e.g. a thread pool worker, see
+    run_in_executor.py) with a single loop.call_soon_threadsafe() - one wake up of the loop for the whole batch instead
+    of one per future
+
+Callbacks of a BroadcastFuture run in the context of the code that completed it, not of the code that added them.
+"""
+import asyncio
+import threading
+import time
+
+_PENDING, _FINISHED, _CANCELLED = 'PENDING', 'FINISHED', 'CANCELLED'
+
+
+class BroadcastFuture:
+    def __init__(self, loop=None):
+        self._loop = loop or asyncio.get_event_loop()
+        self._state = _PENDING
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._waiters = []      # one future per task awaiting this one, so cancelling a waiter only cancels that one
+
+    def get_loop(self):
+        return self._loop
+
+    def done(self):
+        return self._state != _PENDING
+
+    def cancelled(self):
+        return self._state == _CANCELLED
+
+    def result(self):
+        if self._state == _PENDING:
+            raise asyncio.InvalidStateError('Result is not set.')
+        if self._state == _CANCELLED:
+            raise asyncio.CancelledError()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        if self._state == _PENDING:
+            raise asyncio.InvalidStateError('Exception is not set.')
+        if self._state == _CANCELLED:
+            raise asyncio.CancelledError()
+        return self._exception
+
+    def add_done_callback(self, fn):
+        if self.done():
+            self._loop.call_soon(fn, self)
+        else:
+            self._callbacks.append(fn)
+
+    def _settle(self, state, result=None, exception=None):
+        """Mark the future done without running anything, return whether callbacks or waiters are pending"""
+        if self._state != _PENDING:
+            raise asyncio.InvalidStateError('{!r} is already done'.format(self))
+        self._state, self._result, self._exception = state, result, exception
+        return bool(self._callbacks or self._waiters)
+
+    def set_result(self, result):
+        if self._settle(_FINISHED, result=result):
+            self._loop.call_soon(self._fire)
+
+    def set_exception(self, exception):
+        if self._settle(_FINISHED, exception=exception):
+            self._loop.call_soon(self._fire)
+
+    def cancel(self):
+        if self.done():
+            return False
+        if self._settle(_CANCELLED):
+            self._loop.call_soon(self._fire)
+        return True
+
+    def _fire(self):
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:      # one failing callback must not prevent the others from running
+                self._loop.call_exception_handler({'message': 'Exception in BroadcastFuture callback',
+                                                   'exception': e, 'future': self})
+
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if waiter.done():           # the awaiting task was cancelled
+                continue
+            if self._state == _CANCELLED:
+                waiter.cancel()
+            elif self._exception is not None:
+                waiter.set_exception(self._exception)
+            else:
+                waiter.set_result(self._result)
+
+    def __await__(self):
+        if not self.done():
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            yield from waiter
+        return self.result()
+
+    __iter__ = __await__
+
+    def __repr__(self):
+        return '<BroadcastFuture {} callbacks={} waiters={}>'.format(self._state, len(self._callbacks),
+                                                                     len(self._waiters))
+
+
+def _fire_all(futures):
+    for future in futures:
+        future._fire()
+
+
+def set_results(pairs):
+    """
+    Complete every (future, result) pair, running the callbacks of all BroadcastFutures in one loop callback. Futures
+    already done (e.g. cancelled) are skipped, as a plain future would be
+    """
+    to_fire = {}
+    for future, result in pairs:
+        if future.done():
+            continue
+        if isinstance(future, BroadcastFuture):
+            if future._settle(_FINISHED, result=result):
+                to_fire.setdefault(future.get_loop(), []).append(future)
+        else:
+            future.set_result(result)
+    for loop, futures in to_fire.items():
+        loop.call_soon(_fire_all, futures)
+
+
+def set_results_threadsafe(loop, pairs):
+    """set_results() from a thread other than the one running `loop`, waking the loop up once"""
+    loop.call_soon_threadsafe(set_results, list(pairs))
+
+
+# ----- Benchmarks
+
+async def _await(future):
+    return await future
+
+
+def _timed(main):
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+def benchmark(n=20000):
+    def callbacks_on_one_future(make):
+        async def main():
+            future = make()
+            counter = [0]
+            for _ in range(n):
+                future.add_done_callback(lambda _: counter.__setitem__(0, counter[0] + 1))
+            future.set_result(1)
+            while counter[0] < n:
+                await asyncio.sleep(0)
+        return main
+
+    def tasks_awaiting_one_future(make):
+        async def main():
+            future = make()
+            waiters = [asyncio.ensure_future(_await(future)) for _ in range(n)]
+            await asyncio.sleep(0)
+            future.set_result(1)
+            await asyncio.gather(*waiters)
+        return main
+
+    def many_results(make, bulk):
+        async def main():
+            futures = [make() for _ in range(n)]
+            done = asyncio.get_running_loop().create_future()
+            remaining = [n]
+
+            def on_done(_):
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set_result(None)
+            for future in futures:
+                future.add_done_callback(on_done)
+
+            if bulk:
+                set_results((future, i) for i, future in enumerate(futures))
+            else:
+                for i, future in enumerate(futures):
+                    future.set_result(i)
+            await done
+        return main
+
+    def results_from_thread(make, bulk):
+        async def main():
+            loop = asyncio.get_running_loop()
+            futures = [make() for _ in range(n)]
+
+            def worker():
+                if bulk:
+                    set_results_threadsafe(loop, ((future, i) for i, future in enumerate(futures)))
+                else:
+                    for i, future in enumerate(futures):
+                        loop.call_soon_threadsafe(future.set_result, i)
+            thread = threading.Thread(target=worker)
+            thread.start()
+            for future in futures:
+                await future
+            thread.join()
+        return main
+
+    def plain():
+        return asyncio.get_running_loop().create_future()
+
+    def broadcast():
+        return BroadcastFuture(asyncio.get_running_loop())
+
+    cases = [
+        ('{} callbacks on one future'.format(n), callbacks_on_one_future(plain), callbacks_on_one_future(broadcast)),
+        ('{} tasks awaiting one future'.format(n), tasks_awaiting_one_future(plain),
+         tasks_awaiting_one_future(broadcast)),
+        ('{} results, one callback each'.format(n), many_results(plain, bulk=False), many_results(broadcast, bulk=True)),
+        ('{} results set from a thread'.format(n), results_from_thread(plain, bulk=False),
+         results_from_thread(plain, bulk=True)),
+    ]
+    print('{:<36} {:>14} {:>14}'.format('', 'set_result()', 'batched'))
+    for title, naive, batched in cases:
+        print('{:<36} {:>13.1f}ms {:>13.1f}ms'.format(title, _timed(naive) * 1000, _timed(batched) * 1000))
+
+
+def demo():
+    async def main():
+        loop = asyncio.get_running_loop()
+        config = BroadcastFuture(loop)
+        config.add_done_callback(lambda f: print('callback saw', f.result()))
+        readers = [asyncio.ensure_future(_await(config)) for _ in range(3)]
+        await asyncio.sleep(0)
+        config.set_result({'answer': 42})
+        print('readers got', await asyncio.gather(*readers))
+
+        futures = [BroadcastFuture(loop) for _ in range(3)] + [loop.create_future()]
+        threading.Thread(target=set_results_threadsafe, args=(loop, [(f, i) for i, f in enumerate(futures)])).start()
+        print('batch resolved from a thread:', [await future for future in futures])
+
+    asyncio.run(main())
@@ -0,0 +1,370 @@
+"""
+Async connection pool - the Connection sketch of async_with.py, made real and reusable.
+
+Opening a TCP connection costs a round trip (more with TLS) before the first byte of the request is sent. A pool keeps
+connections open between uses, and `async with pool.acquire() as conn:` borrows one for the duration of the block:
+
+*   min_size / max_size: the pool opens up to `max_size` connections, and keeps at least `min_size` of them open even
+    when idle (opened by start(), or by `async with pool:`)
+*   idle eviction: connections left unused for more than `idle_timeout` seconds are closed by a background task, down
+    to `min_size`
+*   health check on checkout: before a pooled connection is handed out, conn.is_alive() (and `health_check(conn)`, an
+    optional coroutine function, when given) must pass. A dead connection is closed and replaced transparently, up to
+    `checkout_retries` times per checkout, waiting `retry_backoff` seconds (doubling) from the second replacement on -
+    when every new connection fails the check (the server is down), get() raises ConnectionError instead of spinning
+*   fairness: when every connection is in use, acquire() waits in a FIFO queue, and a released connection is handed
+    directly to the longest waiting task. A task arriving later cannot grab it first
+*   a block left with an exception discards its connection instead of returning it, since its state (half sent
+    request, unread response) is unknown
+
+`connect` is any coroutine function returning a connection object with an async close(); Connection is a minimal one,
+speaking a line based protocol over asyncio streams.
+"""
+import asyncio
+import time
+from collections import deque
+
+from langauge.percentiles import percentile
+
+
+class Connection:
+    """Line based request / response over a TCP connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    def is_alive(self):
+        return self.writer is not None and not self.writer.is_closing() and not self.reader.at_eof()
+
+    async def request(self, line):
+        self.writer.write(line.rstrip(b'\n') + b'\n')
+        await self.writer.drain()
+        response = await self.reader.readline()
+        if not response:
+            raise ConnectionResetError('connection closed by the server')
+        return response.rstrip(b'\n')
+
+    async def close(self):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+class _Checkout:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def __aenter__(self):
+        self._conn = await self._pool.get(self._timeout)
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._pool.release(self._conn, discard=exc_type is not None)
+
+
+class PoolClosedError(Exception):
+    pass
+
+
+class AsyncConnectionPool:
+    def __init__(self, connect, min_size=0, max_size=10, idle_timeout=30.0, health_check=None, checkout_retries=3,
+                 retry_backoff=0.05, latency_samples=10000):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError('expected 0 <= min_size <= max_size and max_size >= 1')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.checkout_retries = checkout_retries
+        self.retry_backoff = retry_backoff
+
+        self._idle = deque()        # (connection, released at), most recently released on the right
+        self._waiters = deque()     # futures of the tasks waiting for a connection, oldest on the left
+        self._size = 0              # connections open or being opened, borrowed or idle
+        self._closed = False
+        self._reaper = None
+        self._latencies = deque(maxlen=latency_samples)
+        self._stats = {'opened': 0, 'closed': 0, 'checkouts': 0, 'waited': 0, 'unhealthy': 0, 'evicted': 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Open `min_size` connections and start evicting idle ones (otherwise done on the first get())"""
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._evict_idle())
+        await self._fill_to_min_size()
+
+    def acquire(self, timeout=None):
+        """`async with pool.acquire() as conn:` - raises asyncio.TimeoutError after waiting `timeout` seconds"""
+        return _Checkout(self, timeout)
+
+    async def get(self, timeout=None):
+        if self._closed:
+            raise PoolClosedError('pool is closed')
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._evict_idle())
+
+        start = time.perf_counter()
+        slot_reserved = False
+        failures = 0
+        while True:
+            if slot_reserved:
+                conn = await self._open()
+            elif self._idle and not self._waiters:
+                conn = self._idle.pop()[0]
+            elif self._size < self.max_size and not self._waiters:
+                self._size += 1
+                conn = await self._open()
+            else:
+                conn = await self._wait(timeout)
+                if conn is None:            # a connection was discarded, its slot is now ours
+                    slot_reserved = True
+                    continue
+
+            try:
+                healthy = await self._is_healthy(conn)
+            except BaseException:           # cancelled during the check: neither keep the connection nor leak its slot
+                self._discard(conn)
+                raise
+            if healthy:
+                break
+            self._stats['unhealthy'] += 1
+            failures += 1
+            if failures > self.checkout_retries:
+                self._discard(conn)
+                raise ConnectionError('no healthy connection after {} attempts'.format(failures))
+            asyncio.ensure_future(self._close(conn))
+            slot_reserved = True            # replace it, without giving up its slot
+            if failures > 1:                # the first replacement is immediate, a stale connection is common
+                try:
+                    await asyncio.sleep(self.retry_backoff * 2 ** (failures - 2))
+                except BaseException:
+                    self._hand_off(None)
+                    raise
+
+        self._stats['checkouts'] += 1
+        self._latencies.append(time.perf_counter() - start)
+        return conn
+
+    async def _open(self):
+        try:
+            conn = await self._connect()
+        except BaseException:
+            self._hand_off(None)            # let a waiter (or nobody) have the slot
+            raise
+        self._stats['opened'] += 1
+        return conn
+
+    async def _wait(self, timeout):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats['waited'] += 1
+        try:
+            return await asyncio.wait_for(waiter, timeout) if timeout is not None else await waiter
+        except BaseException:
+            if not waiter.done() or waiter.cancelled():
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            elif waiter.exception() is None:
+                self._hand_off(waiter.result())     # handed over just as we gave up: pass it on
+            # else close() set PoolClosedError on the waiter, which is the exception raised here
+            raise
+
+    async def _is_healthy(self, conn):
+        if hasattr(conn, 'is_alive') and not conn.is_alive():
+            return False
+        if self.health_check is not None:
+            try:
+                return bool(await self.health_check(conn))
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, conn):
+        """Close a checked out connection in the background and give its slot up"""
+        asyncio.ensure_future(self._close(conn))
+        self._hand_off(None)
+
+    async def release(self, conn, discard=False):
+        """Give a connection back, or close it when `discard` is true or the pool is closed"""
+        if discard or self._closed:
+            await self._close(conn)
+            self._hand_off(None)
+        else:
+            self._hand_off(conn)
+
+    def _hand_off(self, conn):
+        """Give a connection, or the slot of a closed one when conn is None, to the longest waiting task"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return
+        if conn is None:
+            self._size -= 1
+        elif self._closed:
+            asyncio.ensure_future(self._close(conn))
+            self._size -= 1
+        else:
+            self._idle.append((conn, time.monotonic()))
+
+    async def _close(self, conn):
+        self._stats['closed'] += 1
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def _fill_to_min_size(self):
+        while self._size < self.min_size and not self._closed:
+            self._size += 1
+            self._hand_off(await self._open())
+
+    async def _evict_idle(self):
+        interval = max(0.01, min(self.idle_timeout / 2, 5.0))
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.idle_timeout
+            # the oldest connections are on the left
+            while self._idle and self._idle[0][1] < deadline and self._size > self.min_size:
+                conn = self._idle.popleft()[0]
+                self._size -= 1
+                self._stats['evicted'] += 1
+                await self._close(conn)
+            try:
+                await self._fill_to_min_size()
+            except OSError:
+                pass                        # the server is down: try again on the next round
+
+    async def close(self):
+        """Close the idle connections, and the borrowed ones as they are released"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(PoolClosedError('pool is closed'))
+        while self._idle:
+            self._size -= 1
+            await self._close(self._idle.popleft()[0])
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return dict(self._stats, size=self._size, idle=len(self._idle), waiting=len(self._waiters),
+                    checkout_p50=percentile(latencies, 0.5), checkout_p99=percentile(latencies, 0.99))
+
+
+# ----- Local stand-in server and benchmark
+
+async def start_echo_server(host='127.0.0.1', port=0, connect_delay=0.0):
+    """Line echo server, `connect_delay` simulates the cost of a connection set up (e.g. a TLS handshake)"""
+    async def echo(reader, writer):
+        await asyncio.sleep(connect_delay)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(echo, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def benchmark(requests=5000, concurrency=50, pool_size=10, connect_delay=0.002):
+    async def run(use_pool):
+        server, port = await start_echo_server(connect_delay=connect_delay)
+        pool = AsyncConnectionPool(lambda: Connection('127.0.0.1', port).open(), max_size=pool_size)
+        latencies = []
+        remaining = iter(range(requests))
+
+        async def worker():
+            for i in remaining:
+                start = time.perf_counter()
+                if use_pool:
+                    async with pool.acquire() as conn:
+                        latencies.append(time.perf_counter() - start)
+                        await conn.request(b'%d' % i)
+                else:
+                    async with Connection('127.0.0.1', port) as conn:
+                        latencies.append(time.perf_counter() - start)
+                        await conn.request(b'%d' % i)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        await pool.close()
+        server.close()
+        await server.wait_closed()
+        latencies.sort()
+        return requests / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+    print('{} requests from {} tasks, {} ms connection set up'.format(requests, concurrency, connect_delay * 1000))
+    for name, use_pool in [('connection per request', False), ('pool of {}'.format(pool_size), True)]:
+        rate, p50, p99 = asyncio.run(run(use_pool))
+        print('{:<24} {:>8.0f} req/s   checkout p50 {:>6.2f} ms   p99 {:>6.2f} ms'.format(
+            name, rate, p50 * 1000, p99 * 1000))
+
+
+def demo():
+    async def main():
+        server, port = await start_echo_server()
+
+        async def ping(conn):
+            return await conn.request(b'ping') == b'ping'
+
+        pool = AsyncConnectionPool(lambda: Connection('127.0.0.1', port).open(), min_size=1, max_size=2,
+                                   idle_timeout=0.1, health_check=ping)
+        async with pool:
+            async def client(i):
+                async with pool.acquire() as conn:
+                    return await conn.request('hello {}'.format(i).encode())
+
+            print(await asyncio.gather(*(client(i) for i in range(5))))
+            print('after 5 requests on at most 2 connections:', pool.stats())
+
+            async with pool.acquire() as conn:
+                conn.writer.close()                 # broken while checked out: replaced on the next checkout
+            async with pool.acquire() as conn:
+                print(await conn.request(b'still works'))
+
+            await asyncio.sleep(0.3)
+            print('after idling, down to min_size:', pool.stats())
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
@@ -7,6 +7,8 @@ before completion. If that sounds familiar, it’s because coroutines are very s
 import asyncio
 import inspect
 
+from langauge.async_io.scheduler import Scheduler, yield_now
+
 
 def demo():
     async def co_routine_func():
@@ -86,3 +88,15 @@ def demo():
     loop = asyncio.get_event_loop()
     loop.run_until_complete(coroutine)
     """
+
+    # ----- A scheduler doing the send() / throw() calls above for many coroutines: see scheduler.py
+
+    async def counter(name, n):
+        for i in range(n):
+            print(name, i)
+            await yield_now()       # back to the scheduler, which sends None to the next coroutine in its queue
+
+    scheduler = Scheduler()
+    scheduler.spawn(counter('first', 2))
+    scheduler.spawn(counter('second', 2))
+    scheduler.run()
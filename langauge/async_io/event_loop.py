@@ -21,6 +21,8 @@ only within the context of a coroutine, a task, or a function called from one of
 current running event loop, which is almost always what you want. """
 import asyncio
 
+from langauge.async_io.task_group import TaskGroup
+
 
 def demo():
     loop = asyncio.get_event_loop()
@@ -40,3 +42,13 @@ def demo():
         print('exit from co_routine')       # this co-routine will be exited before the tasks in line above are run
 
     asyncio.run(co_routine())
+
+    # A task group (see task_group.py) ties the tasks to the coroutine that spawned them: it cannot return before they
+    # are all done
+    async def structured_co_routine():
+        async with TaskGroup(limit=2) as group:
+            for i in range(3):
+                await group.spawn(sub_co_routine())
+        print('exit from structured_co_routine, after {spawned} tasks ran'.format(**group.stats()))
+
+    asyncio.run(structured_co_routine())
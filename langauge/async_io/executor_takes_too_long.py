@@ -1,6 +1,8 @@
 import time
 import asyncio
 
+from langauge.async_io.managed_executor import ManagedExecutor
+
 """Problem: This section examines what happens during shutdown when executor jobs take longer to finish than all the 
 pending Task instances. The short answer is: without intervention, you’re going to get errors. What’s happening here 
 is that behind the scenes, run_in_executor() does not create a Task instance: it returns a Future. That means it 
@@ -57,7 +59,17 @@ async def fix_2_main():
     print(f'{time.ctime()} Goodbye!')
 
 
+# fix #3: let a ManagedExecutor track the executor futures and drain them before the loop is closed
+async def fix_3_main():
+    async with ManagedExecutor() as executor:
+        await executor.submit(blocking)
+        print(f'{time.ctime()} Hello!')
+        await asyncio.sleep(1.0)
+        print(f'{time.ctime()} Goodbye!')
+
+
 def demo():
     # asyncio.run(error_main())
     asyncio.run(fix_1_main())
     asyncio.run(fix_2_main())
+    asyncio.run(fix_3_main())
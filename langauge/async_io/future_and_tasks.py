@@ -22,6 +22,8 @@ jobs to process (typically), whereas a concurrent.futures routine runs on a thre
 import asyncio
 from asyncio import Future
 
+from langauge.async_io.broadcast import BroadcastFuture, set_results
+
 
 def demo():
     f = Future()
@@ -48,3 +50,14 @@ def demo():
     print(task.done())
     print(fut.result())
     print(task.result())
+
+    # Thousands of waiters on one result, or many results completed at once: see broadcast.py
+    async def broadcast():
+        shared = BroadcastFuture()
+        for i in range(3):
+            shared.add_done_callback(lambda f, i=i: print('callback', i, 'got', f.result()))
+        others = [BroadcastFuture() for _ in range(2)]
+        set_results([(shared, 'one result for every callback')] + [(f, i) for i, f in enumerate(others)])
+        print([await f for f in others])
+
+    loop.run_until_complete(broadcast())
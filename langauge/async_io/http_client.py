@@ -0,0 +1,300 @@
+"""
+A small HTTP/1.1 client written directly on top of asyncio streams.
+
+Pushing a blocking client (like requests.get) into run_in_executor() works, but every request in flight then occupies
+an executor thread, and the default ThreadPoolExecutor only has min(32, os.cpu_count() + 4) of them: beyond that,
+requests simply queue up. asyncio.open_connection() gives a (StreamReader, StreamWriter) pair instead, and awaiting
+those suspends only the coroutine, so thousands of requests can be in flight on a single thread.
+
+Opening a TCP (and possibly TLS) connection is the most expensive part of a short request. HTTP/1.1 connections are
+persistent ("keep-alive") by default, so after a response has been read completely, its connection is put back into a
+per-host pool and reused by the next request to the same host.
+
+Example:
+
+async with HttpClient() as client:
+    response = await client.get('http://localhost:8080/')
+    print(response.status_code, response.text)
+
+    async for url, response in fetch_all(client, urls, concurrency=20):
+        print(url, response.status_code)
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class HttpResponse:
+    def __init__(self, status_code, reason, headers, body):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers          # header names are lower cased
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def __repr__(self):
+        return '<HttpResponse [{} {}]>'.format(self.status_code, self.reason)
+
+
+class ConnectionPool:
+    """Keeps idle keep-alive connections per (scheme, host, port) and limits the connections open to each host"""
+
+    def __init__(self, max_per_host=10):
+        self.max_per_host = max_per_host
+        self._idle = defaultdict(deque)
+        self._limits = {}
+
+    def limit(self, key):
+        # created lazily, so that the semaphore belongs to the running loop
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.max_per_host)
+        return self._limits[key]
+
+    async def get(self, key):
+        """Return (reader, writer, reused)"""
+        idle = self._idle[key]
+        while idle:
+            reader, writer = idle.pop()
+            # the server may have closed a connection while it sat in the pool
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(host, port, ssl=True if scheme == 'https' else None)
+        return reader, writer, False
+
+    def put(self, key, reader, writer):
+        self._idle[key].append((reader, writer))
+
+    async def close(self):
+        writers = [writer for idle in self._idle.values() for _, writer in idle]
+        self._idle.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+class HttpClient:
+    def __init__(self, max_per_host=10, user_agent='langauge-http-client'):
+        self.pool = ConnectionPool(max_per_host)
+        self.user_agent = user_agent
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def get(self, url, headers=None):
+        return await self.request('GET', url, headers=headers)
+
+    async def request(self, method, url, headers=None, body=b''):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        key = (scheme, parts.hostname, parts.port or DEFAULT_PORTS[scheme])
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+        request_headers = {'Host': parts.netloc, 'User-Agent': self.user_agent, 'Accept': '*/*'}
+        if body:
+            request_headers['Content-Length'] = str(len(body))
+        request_headers.update(headers or {})
+
+        head = '{} {} HTTP/1.1\r\n'.format(method, target)
+        head += ''.join('{}: {}\r\n'.format(name, value) for name, value in request_headers.items())
+        data = head.encode('latin-1') + b'\r\n' + body
+
+        async with self.pool.limit(key):
+            reader, writer, reused = await self.pool.get(key)
+            try:
+                response, keep_alive = await self._exchange(reader, writer, data, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused:
+                    raise
+                # a pooled connection can go stale between two requests, retry once on a fresh one
+                reader, writer, _ = await self.pool.get(key)
+                try:
+                    response, keep_alive = await self._exchange(reader, writer, data, method)
+                except BaseException:
+                    writer.close()
+                    raise
+            except BaseException:
+                # e.g. cancellation half way through a response leaves the connection in an unknown state
+                writer.close()
+                raise
+
+            if keep_alive:
+                self.pool.put(key, reader, writer)
+            else:
+                writer.close()
+        return response
+
+    async def _exchange(self, reader, writer, data, method):
+        writer.write(data)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed before a response was received')
+        version, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        status_code = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+        if method == 'HEAD' or 100 <= status_code < 200 or status_code in (204, 304):
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            # no length given, the body ends when the server closes the connection
+            body = await reader.read()
+            keep_alive = False
+
+        return HttpResponse(status_code, reason[0] if reason else '', headers, body), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # skip optional trailers up to the final empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)     # \r\n after every chunk
+
+
+async def fetch_all(client, urls, concurrency=10):
+    """
+    Async generator yielding (url, response) pairs as the responses arrive, with at most `concurrency` requests in
+    flight. URLs are pulled from the iterable only when there is room for another request, so `urls` may be huge.
+    """
+    urls = iter(urls)
+    pending = {}
+    try:
+        while True:
+            for url in urls:
+                pending[asyncio.ensure_future(client.get(url))] = url
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# ----- Benchmark against a local stand-in server, so that no real network is involved
+
+async def _stand_in_handler(reader, writer, delay=0.005, body=b'Hello from the stand-in server!'):
+    """Answers every request on a connection after `delay` seconds, keeping the connection open (HTTP/1.1 style)"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            await asyncio.sleep(delay)
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: %d\r\n\r\n%s'
+                         % (len(body), body))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_stand_in_server(delay=0.005):
+    server = await asyncio.start_server(lambda r, w: _stand_in_handler(r, w, delay), '127.0.0.1', 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    return server, 'http://{}:{}/'.format(host, port)
+
+
+async def _sample_threads(peak):
+    while True:
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.001)
+
+
+def _blocking_get(url):
+    with urlopen(url) as response:
+        response.read()
+        return response.status
+
+
+async def _bench(approach, requests, concurrency, delay):
+    server, url = await start_stand_in_server(delay)
+    peak = [threading.active_count()]
+    sampler = asyncio.ensure_future(_sample_threads(peak))
+
+    start = time.perf_counter()
+    if approach == 'executor':
+        loop = asyncio.get_running_loop()
+        # the blocking client in the default executor, as in run_in_executor.demo
+        await asyncio.gather(*(loop.run_in_executor(None, _blocking_get, url) for _ in range(requests)))
+    else:
+        async with HttpClient(max_per_host=concurrency) as client:
+            async for _ in fetch_all(client, (url for _ in range(requests)), concurrency):
+                pass
+    elapsed = time.perf_counter() - start
+
+    sampler.cancel()
+    server.close()
+    await server.wait_closed()
+    return requests / elapsed, peak[0]
+
+
+def benchmark(requests=500, concurrency=100, delay=0.005):
+    print('{} GET requests against a local server answering after {} ms'.format(requests, delay * 1000))
+    for approach in ('executor', 'native'):
+        rate, peak_threads = asyncio.run(_bench(approach, requests, concurrency, delay))
+        print('{:<10} {:>8.0f} req/s   peak threads {}'.format(approach, rate, peak_threads))
+
+
+def demo():
+    async def main():
+        server, url = await start_stand_in_server()
+        async with HttpClient() as client:
+            response = await client.get(url)
+            print(response, response.headers, response.text)
+
+            urls = [url + 'page/{}'.format(i) for i in range(5)]
+            async for fetched_url, response in fetch_all(client, urls, concurrency=2):
+                print(fetched_url, response.status_code)
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
@@ -0,0 +1,220 @@
+"""
+Event loop instrumentation - see what a running loop is doing without attaching a debugger.
+
+A stalled asyncio program usually looks idle from the outside. LoopMonitor is an opt-in helper that measures, from
+inside the loop:
+
+*   loop lag: a sampler task asks to be woken up every `lag_interval` seconds and records how late it actually is. Any
+    code that holds the loop without awaiting (a blocking call, a long computation) shows up here, whoever runs it
+*   per-task wall and CPU time: a task factory (loop.set_task_factory()) wraps the coroutine of every new task, timing
+    each step the loop runs (each send()/throw(), see coroutine.py). Totals are kept per coroutine function, so memory
+    does not grow with the number of tasks
+*   slow steps: any single step taking longer than `slow_callback` seconds is recorded with the coroutine that ran it.
+    This is what asyncio's debug mode reports as slow callbacks, without the cost of running in debug mode
+*   pending tasks, and the queue depth of the default executor plus any executor passed to watch_executor()
+
+snapshot() returns all of it as a dict. With `dump_path`, a snapshot is also appended to that file as one JSON line
+every `dump_interval` seconds, so the history of a misbehaving process can be read after the fact, e.g. with
+`tail -f`.
+
+Only tasks created after the monitor starts are timed. Their coroutines are wrapped, so task.get_coro() returns the
+wrapper rather than the original coroutine.
+
+Example:
+
+async def main():
+    async with LoopMonitor(dump_path='loop.jsonl', dump_interval=5):
+        ...
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict, deque
+from collections.abc import Coroutine
+
+from langauge.percentiles import percentile
+
+
+class _TimedCoroutine(Coroutine):
+    """Wraps a coroutine, timing every step the event loop runs"""
+
+    def __init__(self, coro, monitor):
+        self._coro = coro
+        self._monitor = monitor
+        self.name = getattr(coro, '__qualname__', type(coro).__name__)
+        self.created = time.perf_counter()
+        self.cpu = 0.0
+
+    def _step(self, method, *args):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return method(*args)
+        finally:
+            cpu = time.thread_time() - cpu
+            self.cpu += cpu
+            duration = time.perf_counter() - wall
+            if duration >= self._monitor.slow_callback:
+                self._monitor._slow_step(self.name, duration)
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+class LoopMonitor:
+    def __init__(self, lag_interval=0.1, slow_callback=0.05, dump_path=None, dump_interval=10.0, samples=600):
+        self.lag_interval = lag_interval
+        self.slow_callback = slow_callback
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self._lags = deque(maxlen=samples)
+        self._slow_steps = deque(maxlen=50)
+        self._tasks = defaultdict(lambda: {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'max_wall': 0.0, 'max_cpu': 0.0})
+        self._executors = {}
+        self._loop = None
+        self._background = []
+        self._previous_factory = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def watch_executor(self, name, executor):
+        """Report the queue depth of a ThreadPoolExecutor or of anything with a metrics()['queue_length']"""
+        self._executors[name] = executor
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        # created before the task factory is installed, so the monitor does not time its own tasks
+        self._background = [asyncio.ensure_future(self._sample_lag())]
+        if self.dump_path:
+            self._background.append(asyncio.ensure_future(self._dump_periodically()))
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+
+    async def stop(self):
+        self._loop.set_task_factory(self._previous_factory)
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        if self.dump_path:
+            self.dump()
+
+    def _task_factory(self, loop, coro, **kwargs):
+        timed = _TimedCoroutine(coro, self)
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, timed, **kwargs)
+        else:
+            task = asyncio.Task(timed, loop=loop, **kwargs)
+        task.add_done_callback(lambda _: self._task_done(timed))
+        return task
+
+    def _task_done(self, timed):
+        wall = time.perf_counter() - timed.created
+        stats = self._tasks[timed.name]
+        stats['count'] += 1
+        stats['wall'] += wall
+        stats['cpu'] += timed.cpu
+        stats['max_wall'] = max(stats['max_wall'], wall)
+        stats['max_cpu'] = max(stats['max_cpu'], timed.cpu)
+
+    def _slow_step(self, name, duration):
+        self._slow_steps.append({'time': time.time(), 'coroutine': name, 'duration': duration})
+
+    async def _sample_lag(self):
+        while True:
+            expected = self._loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self._lags.append(max(0.0, self._loop.time() - expected))
+
+    async def _dump_periodically(self):
+        while True:
+            await asyncio.sleep(self.dump_interval)
+            self.dump()
+
+    def _executor_queues(self):
+        executors = dict(self._executors)
+        default = getattr(self._loop, '_default_executor', None)
+        if default is not None:
+            executors.setdefault('default', default)
+
+        queues = {}
+        for name, executor in executors.items():
+            if hasattr(executor, 'metrics'):
+                queues[name] = executor.metrics()['queue_length']
+            elif hasattr(executor, '_work_queue'):
+                queues[name] = executor._work_queue.qsize()     # ThreadPoolExecutor has no public API for this
+        return queues
+
+    def snapshot(self):
+        lags = sorted(self._lags)
+        return {
+            'time': time.time(),
+            'loop_lag': {
+                'last': self._lags[-1] if self._lags else 0.0,
+                'p50': percentile(lags, 0.5),
+                'p99': percentile(lags, 0.99),
+                'max': lags[-1] if lags else 0.0,
+            },
+            'pending_tasks': len(asyncio.all_tasks(self._loop)),
+            'executor_queues': self._executor_queues(),
+            'tasks': {name: dict(stats) for name, stats in self._tasks.items()},
+            'slow_steps': list(self._slow_steps),
+        }
+
+    def dump(self):
+        # one short line, written synchronously: cheaper than a hop to a thread
+        with open(self.dump_path, 'a') as file:
+            file.write(json.dumps(self.snapshot()) + '\n')
+
+
+def demo():
+    dump_path = os.path.join(tempfile.gettempdir(), 'loop_monitor_demo.jsonl')
+
+    async def io_bound(i):
+        await asyncio.sleep(0.05 * i)
+
+    async def cpu_bound():
+        sum(i * i for i in range(300000))       # holds the loop: shows up as a slow step and as loop lag
+        await asyncio.sleep(0)
+
+    async def main():
+        async with LoopMonitor(lag_interval=0.01, slow_callback=0.01, dump_path=dump_path, dump_interval=0.1) as monitor:
+            loop = asyncio.get_running_loop()
+            jobs = [loop.run_in_executor(None, time.sleep, 0.05) for _ in range(20)]
+            await asyncio.sleep(0)
+            print('while busy:', json.dumps(monitor.snapshot()['executor_queues']), 'pending tasks',
+                  monitor.snapshot()['pending_tasks'])
+
+            await asyncio.gather(*(io_bound(i) for i in range(5)), cpu_bound(), *jobs)
+            await asyncio.sleep(0.05)
+            snapshot = monitor.snapshot()
+
+        print('loop lag:', {k: round(v * 1000, 1) for k, v in snapshot['loop_lag'].items()}, 'ms')
+        for name, stats in snapshot['tasks'].items():
+            print('{:<30} {}'.format(name, {k: round(v, 4) for k, v in stats.items()}))
+        print('slow steps:', snapshot['slow_steps'])
+
+    asyncio.run(main())
+    with open(dump_path) as file:
+        print('{} JSON lines dumped to {}'.format(sum(1 for _ in file), dump_path))
+    os.remove(dump_path)
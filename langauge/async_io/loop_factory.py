@@ -0,0 +1,228 @@
+"""
+Pluggable event loops - pick the event loop implementation from configuration instead of hard-coding it.
+
+asyncio.new_event_loop() always builds the loop of the default policy. The event loop is just an object implementing
+AbstractEventLoop though, and drop-in replacements exist: uvloop, built on libuv (the I/O library of Node.js), is often
+noticeably faster for network heavy code. It is a third party package and not always installed, so the choice is
+made at runtime:
+
+    'auto'      uvloop when it can be imported, the standard loop otherwise (the default)
+    'uvloop'    uvloop, falling back to the standard loop with a warning if it is not installed
+    'selector'  asyncio.SelectorEventLoop, the standard selector based loop
+    'default'   whatever asyncio.new_event_loop() returns (also a selector loop, except the proactor loop on Windows)
+
+The name comes from the `name` argument or else from the LANGAUGE_EVENT_LOOP environment variable.
+
+new_event_loop() returns a loop of the configured kind, and run() is asyncio.run() on such a loop. Code calling
+asyncio.run() or asyncio.new_event_loop() itself gets its loop from the event loop policy instead: install_policy()
+makes the configured implementation the one every new loop of the process is built with. set_up_demo_loop() is what
+main.py and the demo runner (runner.py) call before an async demo: it installs the policy and sets a fresh current loop,
+for the demos still calling asyncio.get_event_loop(). benchmark() runs a set of microbenchmarks on every implementation available, so the
+difference can be measured on the actual machine.
+"""
+import asyncio
+import os
+import time
+import warnings
+
+ENV_VAR = 'LANGAUGE_EVENT_LOOP'
+IMPLEMENTATIONS = ('auto', 'uvloop', 'selector', 'default')
+
+
+def _uvloop_factory():
+    import uvloop       # optional dependency, only imported when asked for
+    return uvloop.new_event_loop
+
+
+def get_loop_factory(name=None):
+    """Return (implementation name, zero argument callable creating a new loop)"""
+    name = (name or os.environ.get(ENV_VAR) or 'auto').lower()
+    if name not in IMPLEMENTATIONS:
+        raise ValueError('Unknown event loop {!r}, choose one of {}'.format(name, ', '.join(IMPLEMENTATIONS)))
+
+    if name in ('auto', 'uvloop'):
+        try:
+            return 'uvloop', _uvloop_factory()
+        except ImportError:
+            if name == 'uvloop':
+                warnings.warn('uvloop is not installed, falling back to the standard event loop', RuntimeWarning)
+            name = 'default'
+
+    if name == 'selector':
+        return 'selector', asyncio.SelectorEventLoop
+    return 'default', asyncio.new_event_loop
+
+
+def new_event_loop(name=None, set_as_current=True):
+    loop = get_loop_factory(name)[1]()
+    if set_as_current:
+        asyncio.set_event_loop(loop)
+    return loop
+
+
+class LoopFactoryPolicy(asyncio.DefaultEventLoopPolicy):
+    """The default policy, except that new loops are of the configured implementation"""
+
+    def __init__(self, name=None):
+        super().__init__()
+        self.implementation, self._factory = get_loop_factory(name)
+
+    def new_event_loop(self):
+        if self.implementation == 'default':
+            return super().new_event_loop()     # asyncio.new_event_loop() would ask this policy again
+        return self._factory()
+
+
+def install_policy(name=None):
+    """Make asyncio.run() and asyncio.new_event_loop() create loops of the configured kind, return its name"""
+    policy = LoopFactoryPolicy(name)
+    asyncio.set_event_loop_policy(policy)
+    return policy.implementation
+
+
+_demo_loop = None
+
+
+def set_up_demo_loop():
+    """
+    Install the policy (once) and set a new loop of the configured kind as the current loop, then return it. The loop
+    set by the previous call is closed, rather than left for the garbage collector to find still open
+    """
+    global _demo_loop
+    if not isinstance(asyncio.get_event_loop_policy(), LoopFactoryPolicy):
+        install_policy()
+    close_demo_loop()
+    _demo_loop = new_event_loop()
+    return _demo_loop
+
+
+def close_demo_loop():
+    """Close the loop of the last set_up_demo_loop() call, unless a demo is still running it"""
+    global _demo_loop
+    if _demo_loop is not None and not _demo_loop.is_closed() and not _demo_loop.is_running():
+        _demo_loop.close()
+    _demo_loop = None
+
+
+def run(main, name=None):
+    """asyncio.run(main) on a loop of the configured implementation"""
+    loop = new_event_loop(name)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        # the same clean up steps asyncio.run() takes (see async_io.py)
+        try:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            if hasattr(loop, 'shutdown_default_executor'):     # Python 3.9+
+                loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+# ----- Microbenchmarks
+
+async def _noop():
+    pass
+
+
+async def bench_task_creation(n=100000):
+    """Tasks created (and run to completion) per second"""
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(_noop()) for _ in range(n)]
+    await asyncio.wait(tasks)
+    return n / (time.perf_counter() - start)
+
+
+async def bench_sleep0_ping_pong(n=100000):
+    """Context switches per second between two tasks yielding to each other with sleep(0)"""
+    async def player():
+        for _ in range(n):
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(player(), player())
+    return 2 * n / (time.perf_counter() - start)
+
+
+async def bench_tcp_echo(n=10000, payload=b'x' * 64):
+    """Round trips per second to an echo server over localhost"""
+    handler_done = asyncio.get_running_loop().create_future()
+
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+        writer.close()
+        handler_done.set_result(None)
+
+    server = await asyncio.start_server(echo, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        writer.write(payload)
+        await reader.readexactly(len(payload))
+    elapsed = time.perf_counter() - start
+
+    writer.close()
+    await handler_done
+    server.close()
+    await server.wait_closed()
+    return n / elapsed
+
+
+async def bench_gather(n=100000):
+    """Coroutines per second through one asyncio.gather()"""
+    start = time.perf_counter()
+    await asyncio.gather(*(_noop() for _ in range(n)))
+    return n / (time.perf_counter() - start)
+
+
+BENCHMARKS = [
+    ('task creation', bench_task_creation, 'tasks/s'),
+    ('sleep(0) ping-pong', bench_sleep0_ping_pong, 'switches/s'),
+    ('TCP echo over localhost', bench_tcp_echo, 'round trips/s'),
+    ('gather of 100k coroutines', bench_gather, 'coroutines/s'),
+]
+
+
+def available_implementations():
+    names = ['selector']
+    try:
+        _uvloop_factory()
+        names.append('uvloop')
+    except ImportError:
+        pass
+    return names
+
+
+def benchmark(implementations=None):
+    implementations = implementations or available_implementations()
+    print('{:<28}'.format('') + ''.join('{:>18}'.format(name) for name in implementations))
+    for title, bench, unit in BENCHMARKS:
+        rates = [run(bench(), name) for name in implementations]
+        print('{:<28}'.format(title) + ''.join('{:>18,.0f}'.format(rate) for rate in rates) + '  ' + unit)
+
+
+def demo():
+    name, factory = get_loop_factory()
+    print('{}={!r} selects the {} loop: {}'.format(ENV_VAR, os.environ.get(ENV_VAR), name, factory))
+    print(run(asyncio.sleep(0.01, result='ran on a configured loop')))
+
+    policy = asyncio.get_event_loop_policy()
+    try:
+        install_policy('selector')
+
+        async def loop_type():
+            return type(asyncio.get_running_loop()).__name__
+        print('asyncio.run() with the policy installed runs on a', asyncio.run(loop_type()))
+    finally:
+        asyncio.set_event_loop_policy(policy)
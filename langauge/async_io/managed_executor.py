@@ -0,0 +1,184 @@
+"""
+ManagedExecutor - a run_in_executor() that keeps track of its jobs, see executor_takes_too_long.py for the problem.
+
+loop.run_in_executor() returns a plain Future, not a Task, so asyncio.run() neither cancels nor waits for it and the
+loop may be closed while the job is still running in its thread. The two fixes in executor_takes_too_long.py handle a
+single future by hand. ManagedExecutor does the same bookkeeping for every job it runs:
+
+*   every future is tracked until it completes, so the executor knows exactly what is still outstanding
+*   at most `max_pending` jobs may be outstanding (queued or running). submit() waits for room, which pushes back on
+    a producer that is faster than the workers, and submit_nowait() raises asyncio.QueueFull instead. Either way a
+    load spike cannot pile up an unbounded number of futures in memory
+*   shutdown() drains the outstanding jobs, waiting at most `timeout` seconds. Jobs still not done by then are
+    cancelled (those not started yet never run) so that nothing resolves against a closed loop
+*   metrics(): queue length, running jobs and latency percentiles of queue wait and total job time
+
+It is an async context manager, so wrapping the body of main() in `async with ManagedExecutor() as executor:` drains
+the jobs before asyncio.run() closes the loop, even when main() is cancelled.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langauge.percentiles import percentile
+
+
+class ManagedExecutor:
+    def __init__(self, max_workers=None, max_pending=100, drain_timeout=None, latency_samples=1000):
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ManagedExecutor')
+        self._pending = set()
+        self._slots = None
+        self._running = 0
+        self._running_lock = threading.Lock()       # _running is changed from the worker threads
+        self._waits = deque(maxlen=latency_samples)
+        self._latencies = deque(maxlen=latency_samples)
+        self.submitted = self.completed = self.failed = self.rejected = 0
+        self.peak_pending = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.shutdown(self.drain_timeout)
+
+    def _get_slots(self):
+        # A bounded queue holding one token per outstanding job: put() waits while it is full and put_nowait() raises
+        # asyncio.QueueFull. Created lazily, so that it belongs to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Queue(self.max_pending)
+        return self._slots
+
+    def _run(self, func, args, timing):
+        timing.append(time.perf_counter())      # start time, to tell queue wait from run time
+        with self._running_lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._running_lock:
+                self._running -= 1
+
+    def _start(self, func, args):
+        loop = asyncio.get_running_loop()
+        timing = [time.perf_counter()]
+        try:
+            future = loop.run_in_executor(self._executor, self._run, func, args, timing)
+        except BaseException:
+            # e.g. RuntimeError from an executor shut down by a concurrent shutdown(): the job never started, so
+            # _finished() will not free the slot submit() took for it
+            self._get_slots().get_nowait()
+            raise
+
+        self._pending.add(future)
+        self.submitted += 1
+        self.peak_pending = max(self.peak_pending, len(self._pending))
+        future.add_done_callback(lambda f: self._finished(f, timing))
+        return future
+
+    def _finished(self, future, timing):
+        self._pending.discard(future)
+        self._get_slots().get_nowait()
+
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        if len(timing) == 2:
+            submitted, started = timing
+            self._waits.append(started - submitted)
+            self._latencies.append(time.perf_counter() - submitted)
+
+    async def submit(self, func, *args):
+        """Schedule func(*args), waiting for room if max_pending jobs are outstanding. Returns the job's future"""
+        await self._get_slots().put(None)
+        return self._start(func, args)
+
+    def submit_nowait(self, func, *args):
+        """Schedule func(*args) or raise asyncio.QueueFull if max_pending jobs are outstanding"""
+        try:
+            self._get_slots().put_nowait(None)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        return self._start(func, args)
+
+    async def run(self, func, *args):
+        """Schedule func(*args) and wait for its result"""
+        return await (await self.submit(func, *args))
+
+    async def drain(self, timeout=None):
+        """Wait up to `timeout` seconds for the outstanding jobs, returning the futures that are still not done"""
+        if not self._pending:
+            return set()
+        _, not_done = await asyncio.wait(set(self._pending), timeout=timeout)
+        return not_done
+
+    async def shutdown(self, timeout=None):
+        """Drain outstanding jobs for at most `timeout` seconds, cancel the rest and shut the threads down"""
+        not_done = await self.drain(timeout)
+        for future in not_done:
+            # cancelling the asyncio future also cancels the job if it has not started yet; a running job finishes in
+            # its thread, but its result is dropped instead of being set on a (possibly closed) loop
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        return len(not_done)
+
+    def metrics(self):
+        with self._running_lock:
+            running = self._running
+        waits, latencies = sorted(self._waits), sorted(self._latencies)
+        return {
+            'queue_length': len(self._pending) - running,
+            'running': running,
+            'pending': len(self._pending),
+            'peak_pending': self.peak_pending,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'queue_wait_p50': percentile(waits, 0.5),
+            'queue_wait_p95': percentile(waits, 0.95),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'latency_max': latencies[-1] if latencies else 0.0,
+        }
+
+
+def demo():
+    def blocking(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    async def spike():
+        # 2,000 jobs pushed as fast as possible; at most 50 futures exist at any time
+        async with ManagedExecutor(max_workers=8, max_pending=50) as executor:
+            for _ in range(2000):
+                await executor.submit(blocking, 0.001)
+            print('during the spike:', executor.metrics())
+        print('after draining:  ', executor.metrics())
+
+    async def rejecting():
+        async with ManagedExecutor(max_workers=2, max_pending=4) as executor:
+            for i in range(10):
+                try:
+                    executor.submit_nowait(blocking, 0.1)
+                except asyncio.QueueFull:
+                    print('job {} rejected, {} jobs outstanding'.format(i, executor.metrics()['pending']))
+
+    async def slow_shutdown():
+        # like error_main() in executor_takes_too_long.py, but the jobs are drained (for at most 0.5s) before the loop
+        # closes, and the one outliving the deadline is dropped cleanly instead of raising RuntimeError
+        executor = ManagedExecutor()
+        await executor.submit(blocking, 2)
+        await executor.submit(blocking, 0.1)
+        print('abandoned after the drain deadline:', await executor.shutdown(timeout=0.5))
+
+    asyncio.run(spike())
+    asyncio.run(rejecting())
+    asyncio.run(slow_shutdown())
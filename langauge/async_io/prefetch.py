@@ -0,0 +1,149 @@
+"""
+Prefetching async iteration - keeps up to `window` items in flight while the consumer of an async for loop works.
+
+A plain async for loop is serialized: __anext__() is awaited, the body runs, and only then is the next __anext__()
+awaited. When every step waits on I/O (see AsyncIterationProtocol in async_for_and_async_comphrension.py), the loop
+takes the sum of all the waits. Prefetcher pulls items from the source in a background task and starts `fetch(item)`
+for each one as a Task, so up to `window` fetches overlap with each other and with the body of the loop.
+
+ordered=True yields results in the order of the source, waiting on the oldest fetch first. ordered=False yields each
+result as soon as its fetch completes.
+
+Backpressure: a slot is taken for every item pulled from the source and given back only once the consumer has received
+its result. With a slow consumer the source is therefore never more than `window` items ahead, so memory stays bounded
+however long (or endless) the source is.
+
+Without `fetch`, the items themselves are yielded; Prefetcher then simply reads ahead of the consumer, which is useful
+with async generators such as doubler() that await something between items.
+"""
+import asyncio
+import time
+
+_DONE = object()
+
+
+async def _as_async_iterator(source):
+    if hasattr(source, '__aiter__'):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+async def _identity(item):
+    return item
+
+
+class Prefetcher:
+    def __init__(self, source, fetch=None, window=4, ordered=True):
+        if window < 1:
+            raise ValueError('window must be at least 1')
+        self.source = source
+        self.fetch = fetch or _identity
+        self.window = window
+        self.ordered = ordered
+        self._feeder = None
+
+    def __aiter__(self):
+        if self._feeder is None:
+            self._slots = asyncio.Semaphore(self.window)
+            self._queue = asyncio.Queue()
+            self._pending = set()
+            self._feeder = asyncio.ensure_future(self._feed())
+        return self
+
+    async def __anext__(self):
+        task = await self._queue.get()
+        if task is _DONE:
+            self._queue.put_nowait(_DONE)       # keep raising StopAsyncIteration on further calls
+            raise StopAsyncIteration
+        try:
+            return await task
+        finally:
+            self._slots.release()
+
+    async def __aenter__(self):
+        return self.__aiter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Cancel the feeder and any fetches still in flight"""
+        if self._feeder is None:
+            return
+        tasks = [self._feeder, *self._pending]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, item):
+        task = asyncio.ensure_future(self.fetch(item))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        if self.ordered:
+            self._queue.put_nowait(task)
+        else:
+            # queued only once finished, so the consumer gets results in completion order
+            task.add_done_callback(self._queue.put_nowait)
+
+    async def _feed(self):
+        items = _as_async_iterator(self.source)
+        try:
+            while True:
+                # take the slot before pulling the item, so that the source is not read ahead of the window
+                await self._slots.acquire()
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    self._slots.release()
+                    break
+                self._start(item)
+        except Exception as e:
+            # surface errors of the source to the consumer, after the results fetched before it
+            failed = asyncio.get_running_loop().create_future()
+            failed.set_exception(e)
+            self._queue.put_nowait(failed)
+
+        if not self.ordered and self._pending:
+            await asyncio.wait(set(self._pending))
+        self._queue.put_nowait(_DONE)
+
+
+def demo():
+    async def fetch(i):
+        await asyncio.sleep(0.1 if i % 2 else 0.3)    # pretend I/O
+        return i
+
+    async def main():
+        start = time.perf_counter()
+        results = [await fetch(i) async for i in _as_async_iterator(range(10))]
+        print('serial:      {} in {:.2f}s'.format(results, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        results = [i async for i in Prefetcher(range(10), fetch, window=5)]
+        print('ordered:     {} in {:.2f}s'.format(results, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        results = [i async for i in Prefetcher(range(10), fetch, window=5, ordered=False)]
+        print('unordered:   {} in {:.2f}s'.format(results, time.perf_counter() - start))
+
+        # backpressure: with a slow consumer, an endless source is never read more than `window` items ahead
+        pulled = []
+
+        def endless():
+            i = 0
+            while True:
+                pulled.append(i)
+                yield i
+                i += 1
+
+        async with Prefetcher(endless(), fetch, window=3) as results:
+            async for i in results:
+                await asyncio.sleep(0.2)
+                if i == 4:
+                    break
+        print('consumed 5 items of an endless source, pulled {} of them'.format(len(pulled)))
+
+    asyncio.run(main())
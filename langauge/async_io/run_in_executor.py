@@ -1,6 +1,9 @@
 """
 It cannot be possible to modify some functions to return coroutines, example functions from external libs.
 In such cases, an executor can be used.
+
+The executor function hands its result back through the future run_in_executor() returns. For a thread that needs to
+hand over several results as it goes, see BridgeQueue in thread_bridge.py.
 """
 import asyncio
 import requests
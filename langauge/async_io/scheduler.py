@@ -0,0 +1,218 @@
+"""
+A minimal coroutine scheduler - the send()/throw() machinery of coroutine.py, driving many coroutines at once.
+
+coroutine.py drives one coroutine by hand: send(None) runs it up to its next suspension point, throw() injects an
+exception (which is how task.cancel() works), and StopIteration carries the return value. That is all an event loop
+needs to run coroutines. asyncio adds everything needed for I/O on top (a selector polled on every iteration, timers,
+Handles, Futures, contextvars), which pure CPU work - a simulation, a state machine, a game of agents taking turns -
+pays for without using.
+
+Scheduler keeps only a deque of ready tasks:
+
+*   spawn(coro) appends a new task to the run queue, run() steps tasks in turn until the queue is empty
+*   `await yield_now()` (or `await asyncio.sleep(0)`, which also yields a bare None) puts the task back at the end of the
+    queue, letting the others run
+*   `await task` suspends the current task until `task` is done and returns its result (or raises its exception)
+*   task.cancel() throws CancelledError into the coroutine the next time it is stepped
+
+There is no selector and no timers: awaiting anything else (asyncio.sleep(1), a socket, an asyncio future) is an
+error, reported by throwing RuntimeError into the coroutine that did it.
+"""
+import asyncio
+import time
+from collections import deque
+
+_PENDING, _DONE = 'PENDING', 'DONE'
+
+
+class _YieldNow:
+    __slots__ = ()
+
+    def __await__(self):
+        yield
+
+
+_YIELD_NOW = _YieldNow()
+
+
+def yield_now():
+    """`await yield_now()` - give the other tasks a turn (the same object every time, nothing is allocated)"""
+    return _YIELD_NOW
+
+
+class SimTask:
+    __slots__ = ('coro', 'scheduler', 'state', '_result', '_exception', '_cancelled', '_throw', '_waiters',
+                 '_waiting_on')
+
+    def __init__(self, coro, scheduler):
+        self.coro = coro
+        self.scheduler = scheduler
+        self.state = _PENDING
+        self._result = self._exception = None
+        self._cancelled = False
+        self._throw = None          # exception to throw into the coroutine on its next step
+        self._waiters = []          # tasks suspended in `await self`
+        self._waiting_on = None     # the task this one is suspended on
+
+    def done(self):
+        return self.state == _DONE
+
+    def cancelled(self):
+        return self._cancelled
+
+    def result(self):
+        if self.state != _DONE:
+            raise asyncio.InvalidStateError('Result is not ready.')
+        if self._cancelled:
+            raise asyncio.CancelledError()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self):
+        if self.state == _DONE:
+            return False
+        self._throw = asyncio.CancelledError()
+        if self._waiting_on is not None:        # parked: wake it up so the CancelledError is delivered
+            self._waiting_on._waiters.remove(self)
+            self._waiting_on = None
+            self.scheduler._ready.append(self)
+        return True
+
+    def __await__(self):
+        if self.state != _DONE:
+            yield self
+        return self.result()
+
+    def _finish(self, result=None, exception=None, cancelled=False):
+        self.state = _DONE
+        self._result, self._exception, self._cancelled = result, exception, cancelled
+        ready = self.scheduler._ready
+        for waiter in self._waiters:
+            waiter._waiting_on = None
+            ready.append(waiter)
+        self._waiters = []
+
+    def __repr__(self):
+        return '<SimTask {} {}>'.format(getattr(self.coro, '__qualname__', self.coro), self.state)
+
+
+class Scheduler:
+    def __init__(self):
+        self._ready = deque()
+        self.steps = 0
+
+    def spawn(self, coro):
+        task = SimTask(coro, self)
+        self._ready.append(task)
+        return task
+
+    def run(self):
+        """Step the ready tasks round robin, until none is left"""
+        ready = self._ready
+        popleft, append = ready.popleft, ready.append
+        steps = 0
+        while ready:
+            task = popleft()
+            steps += 1
+            try:
+                if task._throw is None:
+                    yielded = task.coro.send(None)
+                else:
+                    exception, task._throw = task._throw, None
+                    yielded = task.coro.throw(exception)
+            except StopIteration as e:
+                task._finish(result=e.value)
+                continue
+            except asyncio.CancelledError:
+                task._finish(cancelled=True)
+                continue
+            except Exception as e:
+                task._finish(exception=e)
+                continue
+
+            if yielded is None:
+                append(task)
+            elif isinstance(yielded, SimTask):
+                if yielded.state == _DONE:
+                    append(task)
+                else:
+                    task._waiting_on = yielded
+                    yielded._waiters.append(task)
+            else:
+                task._throw = RuntimeError('Scheduler cannot wait for {!r}, only for yield_now() and SimTasks'
+                                           .format(yielded))
+                append(task)
+        self.steps += steps
+
+    def run_until_complete(self, coro):
+        task = self.spawn(coro)
+        self.run()
+        return task.result()
+
+
+# ----- Benchmark
+
+async def _switcher(n, pause):
+    for _ in range(n):
+        await pause()
+
+
+def benchmark(tasks=100, switches=10000):
+    total = tasks * switches
+
+    def on_asyncio(pause):
+        async def main():
+            await asyncio.gather(*(_switcher(switches, pause) for _ in range(tasks)))
+        return lambda: asyncio.run(main())
+
+    def on_scheduler(pause):
+        def run():
+            scheduler = Scheduler()
+            for _ in range(tasks):
+                scheduler.spawn(_switcher(switches, pause))
+            scheduler.run()
+        return run
+
+    def sleep0():
+        return asyncio.sleep(0)
+
+    print('{} tasks x {} switches'.format(tasks, switches))
+    for name, run in [('asyncio, asyncio.sleep(0)', on_asyncio(sleep0)),
+                      ('Scheduler, asyncio.sleep(0)', on_scheduler(sleep0)),
+                      ('Scheduler, yield_now()', on_scheduler(yield_now))]:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print('{:<28} {:>12,.0f} switches/s'.format(name, total / elapsed))
+
+
+def demo():
+    scheduler = Scheduler()
+
+    async def walker(name, steps):
+        for step in range(steps):
+            print(name, 'step', step)
+            await yield_now()
+        return name + ' arrived'
+
+    async def forever():
+        try:
+            while True:
+                await yield_now()
+        except asyncio.CancelledError:
+            print('forever() cancelled')
+            raise
+
+    async def main():
+        a, b = scheduler.spawn(walker('a', 2)), scheduler.spawn(walker('b', 3))
+        endless = scheduler.spawn(forever())
+        print(await a, '/', await b)
+        endless.cancel()
+        try:
+            await endless
+        except asyncio.CancelledError:
+            print('endless task done, cancelled:', endless.cancelled())
+        return 'main done'
+
+    print(scheduler.run_until_complete(main()), 'in', scheduler.steps, 'steps')
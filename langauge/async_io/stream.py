@@ -0,0 +1,219 @@
+"""
+Async stream pipelines - map / filter / batch / merge / take over async iterables, in constant memory.
+
+The comprehensions of async_for_and_async_comphrension.py build a list: [x async for x in doubler(3)] holds every item
+at once, and never finishes on an endless source. The functions below are async generators instead, each taking an
+async (or plain) iterable and returning one, so they chain into a pipeline that only ever holds a few items:
+
+    async for batch in abatch(afilter(is_valid, amap(fetch, source, concurrency=10)), size=100, timeout=0.5):
+        await store(batch)
+
+*   amap(func, source, concurrency=1, ordered=True): func(item) for every item, up to `concurrency` calls in flight at
+    once (see Prefetcher in prefetch.py). func may be a coroutine function or a plain function
+*   afilter(predicate, source): the items for which predicate(item) (or `await predicate(item)`) is true
+*   abatch(source, size, timeout=None): lists of up to `size` items. With `timeout`, a batch is also yielded when
+    `timeout` seconds have passed since its first item arrived, so a slow source does not hold items back forever
+*   amerge(*sources): the items of all sources, interleaved as they arrive
+*   atake(source, n): the first n items, after which the source is closed
+
+Backpressure: every stage pulls from the one before only when asked for an item (amap: at most `concurrency` items
+ahead; abatch and amerge read ahead through a queue of bounded size). A slow consumer therefore slows the whole
+pipeline down to its pace, instead of items piling up in memory between stages.
+
+Closing a stage (aclose()) stops its background tasks (amap, abatch, amerge) and closes its source in turn, so closing
+the last stage after breaking out of its loop shuts the whole pipeline down; atake() does that for its source.
+"""
+import asyncio
+import inspect
+import time
+import tracemalloc
+
+from langauge.async_io.prefetch import Prefetcher, _as_async_iterator
+
+_DONE = object()
+
+
+class _Failure:
+    """The exception a source raised, as queued by _pump(): items may be exception objects themselves"""
+    __slots__ = ('exception',)
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+async def _call(func, item):
+    result = func(item)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _aclose(source):
+    if hasattr(source, 'aclose'):
+        await source.aclose()
+
+
+async def amap(func, source, concurrency=1, ordered=True):
+    prefetcher = Prefetcher(source, lambda item: _call(func, item), window=concurrency, ordered=ordered)
+    try:
+        async for result in prefetcher:
+            yield result
+    finally:
+        await prefetcher.aclose()
+        await _aclose(source)
+
+
+async def afilter(predicate, source):
+    try:
+        async for item in _as_async_iterator(source):
+            if await _call(predicate, item):
+                yield item
+    finally:
+        await _aclose(source)
+
+
+async def _pump(source, queue):
+    """Copy the items of `source` into `queue`, then _DONE (or a _Failure with the exception the source raised)"""
+    try:
+        async for item in _as_async_iterator(source):
+            await queue.put(item)
+    except Exception as e:
+        await queue.put(_Failure(e))
+        return
+    await queue.put(_DONE)
+
+
+async def _stop(tasks, sources):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for source in sources:
+        await _aclose(source)
+
+
+async def abatch(source, size, timeout=None):
+    if size < 1:
+        raise ValueError('size must be at least 1')
+    queue = asyncio.Queue(maxsize=size)
+    pump = asyncio.ensure_future(_pump(source, queue))
+    loop = asyncio.get_running_loop()
+    try:
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.exception
+            batch = [item]
+            deadline = None if timeout is None else loop.time() + timeout
+            while len(batch) < size:
+                if deadline is None:
+                    item = await queue.get()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _DONE:
+                    finished = True
+                    break
+                if isinstance(item, _Failure):
+                    yield batch             # what was read before the error, then the error
+                    raise item.exception
+                batch.append(item)
+            yield batch
+    finally:
+        await _stop([pump], [source])
+
+
+async def amerge(*sources):
+    queue = asyncio.Queue(maxsize=max(1, len(sources)))
+    pumps = [asyncio.ensure_future(_pump(source, queue)) for source in sources]
+    try:
+        running = len(pumps)
+        while running:
+            item = await queue.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, _Failure):
+                raise item.exception
+            else:
+                yield item
+    finally:
+        await _stop(pumps, sources)
+
+
+async def atake(source, n):
+    try:
+        if n <= 0:
+            return
+        taken = 0
+        async for item in _as_async_iterator(source):
+            yield item
+            taken += 1
+            if taken >= n:
+                break
+    finally:
+        await _aclose(source)
+
+
+# ----- Memory benchmark
+
+async def _numbers(n=None, pulled=None):
+    i = 0
+    while n is None or i < n:
+        if pulled is not None:
+            pulled[0] += 1
+        yield i
+        i += 1
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+
+
+async def _slow_square(x):
+    await asyncio.sleep(0)
+    return x * x
+
+
+def benchmark(sizes=(10000, 100000)):
+    async def materialized(n):
+        squares = [await _slow_square(x) async for x in _numbers(n)]
+        evens = [x for x in squares if x % 2 == 0]
+        return sum(len(evens[i:i + 100]) for i in range(0, len(evens), 100))
+
+    async def pipeline(n):
+        count = 0
+        batches = abatch(afilter(lambda x: x % 2 == 0, amap(_slow_square, _numbers(n), concurrency=16)), size=100)
+        async for batch in batches:
+            count += len(batch)
+        return count
+
+    print('squares of n numbers, keeping the even ones, in batches of 100')
+    for name, run in [('list comprehensions', materialized), ('amap/afilter/abatch', pipeline)]:
+        for n in sizes:
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = asyncio.run(run(n))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('{:<20} n={:<7} {:>6} items  {:>6.2f}s  peak memory {:>8.1f} KB'.format(
+                name, n, count, elapsed, peak / 1024))
+
+
+def demo():
+    async def main():
+        print([x async for x in amerge(_numbers(3), atake(_numbers(), 2))])
+
+        # an endless source: only what the consumer asks for is pulled (plus what the stages read ahead)
+        pulled = [0]
+        start = time.perf_counter()
+        batches = abatch(amap(_slow_square, _numbers(pulled=pulled), concurrency=4), size=3, timeout=0.05)
+        print([batch async for batch in atake(batches, 4)], '- pulled', pulled[0], 'numbers from an endless source',
+              'in {:.2f}s'.format(time.perf_counter() - start))
+
+    asyncio.run(main())
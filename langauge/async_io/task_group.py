@@ -0,0 +1,249 @@
+"""
+Structured concurrency - tasks that cannot outlive the block that started them.
+
+asyncio.create_task() starts a task and forgets about it: if the coroutine that created it returns, the task keeps
+running on its own (or is cancelled by asyncio.run() when the loop shuts down, see event_loop.py). Nobody waits for
+it, nobody sees its exception. A task group ties tasks to an `async with` block instead:
+
+    async with TaskGroup(limit=100, timeout=30) as group:
+        for url in urls:
+            await group.spawn(fetch(url))
+    # here every task spawned above has finished, one way or another
+
+*   the block only exits once every task spawned in it is done
+*   `limit` bounds how many tasks run at once: spawn() waits for a free slot (a semaphore) before starting the task.
+    A loop spawning 100,000 coroutines this way only ever holds `limit` tasks in memory, where
+    gather(*(fetch(url) for url in urls)) creates all 100,000 tasks up front
+*   error modes: with mode='fail_fast' (the default) the first task failing cancels all the other tasks, and the block
+    raises TaskGroupError. With mode='collect_all' the other tasks keep running, and TaskGroupError carries every
+    exception raised. An exception raised by the body of the with block itself cancels all tasks and is re-raised
+*   `timeout`: when the deadline passes, every task is cancelled, as is the body of the with block, and the block
+    raises asyncio.TimeoutError
+*   stats() reports how many tasks were spawned / succeeded / failed / were cancelled, how long they ran and how long
+    spawn() had to wait for a slot
+
+Python 3.11 ships asyncio.TaskGroup, which has no concurrency limit nor deadline. This one also runs on Python 3.8,
+where there is no ExceptionGroup, hence TaskGroupError. Like asyncio.TaskGroup, the group takes back (uncancel(), on
+3.11+) the cancellation it sends its own task on fail fast or on the deadline, so that task's cancelling() count is back
+to 0 afterwards, as asyncio.timeout() and the other groups of the task expect.
+"""
+import asyncio
+import time
+import tracemalloc
+
+FAIL_FAST = 'fail_fast'
+COLLECT_ALL = 'collect_all'
+
+
+class TaskGroupError(Exception):
+    """Raised when tasks of a group failed, `errors` holds their exceptions"""
+
+    def __init__(self, errors):
+        super().__init__('{} task(s) failed: {}'.format(len(errors), ', '.join(repr(e) for e in errors[:3])))
+        self.errors = errors
+
+
+class TaskGroup:
+    def __init__(self, limit=None, mode=FAIL_FAST, timeout=None):
+        if mode not in (FAIL_FAST, COLLECT_ALL):
+            raise ValueError('mode must be {!r} or {!r}'.format(FAIL_FAST, COLLECT_ALL))
+        self.limit = limit
+        self.mode = mode
+        self.timeout = timeout
+        self.errors = []
+
+        self._slots = asyncio.Semaphore(limit) if limit else None
+        self._tasks = set()
+        self._parent = None
+        self._deadline = None
+        self._exiting = False
+        self._aborted = False
+        self._timed_out = False
+        self._cancelling_parent = False     # a CancelledError is on its way to the parent, sent by the group
+
+        self._started = None
+        self._stats = {'spawned': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0, 'peak_running': 0,
+                       'task_time': 0.0, 'max_task_time': 0.0, 'spawn_wait': 0.0, 'max_spawn_wait': 0.0}
+
+    async def __aenter__(self):
+        self._parent = asyncio.current_task()
+        self._started = time.perf_counter()
+        if self.timeout is not None:
+            self._deadline = asyncio.get_running_loop().call_later(self.timeout, self._on_deadline)
+        return self
+
+    async def spawn(self, coro):
+        """Start a task running `coro` once a slot is free, and return it"""
+        if self._exiting or self._aborted:
+            coro.close()        # never awaited otherwise, which would warn
+            raise RuntimeError('TaskGroup is {}'.format('closing' if self._exiting else 'aborted'))
+
+        if self._slots is not None:
+            wait = time.perf_counter()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                coro.close()
+                raise
+            wait = time.perf_counter() - wait
+            self._stats['spawn_wait'] += wait
+            self._stats['max_spawn_wait'] = max(self._stats['max_spawn_wait'], wait)
+
+        task = asyncio.ensure_future(coro)
+        started = time.perf_counter()
+        task.add_done_callback(lambda done: self._on_task_done(done, started))
+        self._tasks.add(task)
+        self._stats['spawned'] += 1
+        self._stats['peak_running'] = max(self._stats['peak_running'], len(self._tasks))
+        return task
+
+    def _on_task_done(self, task, started):
+        self._tasks.discard(task)
+        if self._slots is not None:
+            self._slots.release()
+
+        elapsed = time.perf_counter() - started
+        self._stats['task_time'] += elapsed
+        self._stats['max_task_time'] = max(self._stats['max_task_time'], elapsed)
+
+        if task.cancelled():
+            self._stats['cancelled'] += 1
+        elif task.exception() is not None:     # also marks the exception as retrieved
+            self._stats['failed'] += 1
+            self.errors.append(task.exception())
+            if self.mode == FAIL_FAST:
+                self._abort()
+        else:
+            self._stats['succeeded'] += 1
+
+    def _abort(self):
+        """Cancel every task, and the body of the with block unless it already reached the end"""
+        if self._aborted:
+            return
+        self._aborted = True
+        for task in self._tasks:
+            task.cancel()
+        if not self._exiting and self._parent is not None:
+            self._cancelling_parent = True
+            self._parent.cancel()
+
+    def _consume_own_cancellation(self):
+        """The body got the CancelledError sent by _abort(): True unless the task was also cancelled by someone else"""
+        self._cancelling_parent = False
+        if hasattr(self._parent, 'uncancel'):      # Python 3.11+
+            return self._parent.uncancel() == 0
+        return True
+
+    def _on_deadline(self):
+        self._timed_out = True
+        self._abort()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._exiting = True
+        if exc_type is asyncio.CancelledError and self._cancelling_parent and self._consume_own_cancellation():
+            exc_type = exc = None               # our own cancellation of the body, not an error
+        elif exc is not None:
+            self._abort()                       # the body failed or was cancelled from outside: stop the tasks
+
+        cancelled_from_outside = exc_type is asyncio.CancelledError
+        while self._tasks or self._cancelling_parent:
+            try:
+                if self._tasks:
+                    await asyncio.wait(set(self._tasks))
+                else:
+                    await asyncio.sleep(0)      # lets a cancellation the body did not receive yet arrive here
+            except asyncio.CancelledError:
+                if not (self._cancelling_parent and self._consume_own_cancellation()):
+                    cancelled_from_outside = True
+                    self._abort()
+
+        if self._deadline is not None:
+            self._deadline.cancel()
+        self._stats['elapsed'] = time.perf_counter() - self._started
+
+        if cancelled_from_outside:
+            raise asyncio.CancelledError()
+        if exc is not None:
+            return False                        # re-raise the exception of the body
+        if self._timed_out:
+            raise asyncio.TimeoutError('TaskGroup deadline of {}s exceeded'.format(self.timeout))
+        if self.errors:
+            raise TaskGroupError(self.errors)
+        return False
+
+    def stats(self):
+        stats = dict(self._stats, running=len(self._tasks))
+        finished = stats['succeeded'] + stats['failed'] + stats['cancelled']
+        stats['mean_task_time'] = stats['task_time'] / finished if finished else 0.0
+        return stats
+
+
+# ----- Memory benchmark
+
+async def _job(i):
+    await asyncio.sleep(0.001)
+    return i
+
+
+def benchmark(n=50000, limit=1000):
+    async def with_gather():
+        await asyncio.gather(*(_job(i) for i in range(n)))
+
+    async def with_group():
+        async with TaskGroup(limit=limit) as group:
+            for i in range(n):
+                await group.spawn(_job(i))
+
+    print('Fan out of {:,} coroutines'.format(n))
+    for name, main in [('gather()', with_gather), ('TaskGroup(limit={})'.format(limit), with_group)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('{:<22} {:>6.2f}s  peak memory {:>7.1f} MB'.format(name, elapsed, peak / (1 << 20)))
+
+
+def demo():
+    async def work(i, delay=0.01):
+        await asyncio.sleep(delay)
+        if i == 7:
+            raise ValueError('job {} failed'.format(i))
+        return i
+
+    def cancelling():
+        # the cancellations a group sent its task must be taken back once handled (Task.cancelling() is 3.11+)
+        task = asyncio.current_task()
+        return task.cancelling() if hasattr(task, 'cancelling') else 0
+
+    async def main():
+        async with TaskGroup(limit=3) as group:
+            tasks = [await group.spawn(work(i)) for i in range(6)]
+        print('all done:', [task.result() for task in tasks], group.stats())
+
+        try:
+            async with TaskGroup(limit=4) as group:
+                for i in range(20):
+                    await group.spawn(work(i, delay=0.01 + 0.002 * i))
+        except TaskGroupError as e:
+            print('fail fast:', e, '-', group.stats()['cancelled'], 'tasks cancelled')
+        assert cancelling() == 0, cancelling()
+
+        try:
+            async with TaskGroup(mode=COLLECT_ALL) as group:
+                for i in range(5, 10):
+                    await group.spawn(work(i))
+        except TaskGroupError as e:
+            print('collect all:', e.errors, '-', group.stats()['succeeded'], 'tasks succeeded')
+
+        try:
+            async with TaskGroup(timeout=0.05) as group:
+                await group.spawn(work(1, delay=10))
+                await asyncio.sleep(10)
+        except asyncio.TimeoutError as e:
+            print(e, '-', group.stats()['cancelled'], 'task cancelled')
+        assert cancelling() == 0, cancelling()
+        print(await asyncio.wait_for(work(1), 1), 'after the groups: wait_for() still works in this task')
+
+    asyncio.run(main())
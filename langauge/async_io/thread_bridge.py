@@ -0,0 +1,307 @@
+"""
+Thread / asyncio bridges - a queue and an event usable from threads and from coroutines alike.
+
+asyncio.Queue and asyncio.Event are not thread safe: only the thread running their loop may touch them. A thread
+(e.g. a run_in_executor() worker, see run_in_executor.py) handing a result to a coroutine has to go through the loop,
+either with loop.call_soon_threadsafe(queue.put_nowait, item) or asyncio.run_coroutine_threadsafe(queue.put(item),
+loop).result(), which also blocks the thread until the loop got around to it. Each of those wakes the loop up once per
+item, through the self-pipe of the loop (a system call on both sides).
+
+BridgeQueue and BridgeEvent keep their state behind a threading.Lock instead, so any thread can use them directly:
+
+*   threads block in get() / wait() on a threading.Condition, coroutines await async_get() / async_wait() on a future
+    of their loop. Neither polls, and no helper thread is needed per waiter
+*   waking coroutines up from another thread takes loop.call_soon_threadsafe(), but only one per loop until that
+    callback has run: items put in the meantime (put_many() puts a whole batch at once) ride on the same wake up,
+    which then hands items to every waiting coroutine of that loop
+*   async_get_batch() takes everything available (up to a maximum) in one go, the consumer side of the batching
+
+BridgeQueue is unbounded, like asyncio.Queue() without a maxsize.
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class _AsyncWaiters:
+    """Futures of the coroutines waiting on a bridge, and the loops with a wake up already scheduled"""
+
+    def __init__(self):
+        self.futures = deque()
+        self.scheduled = set()
+
+    def loops_to_wake(self):
+        """Called with the lock held: the loops needing a wake up, marked as scheduled"""
+        loops = []
+        for future in self.futures:
+            loop = future.get_loop()
+            if loop not in self.scheduled:
+                self.scheduled.add(loop)
+                loops.append(loop)
+        return loops
+
+    def discard(self, future):
+        """Called with the lock held: forget the future of a cancelled waiter"""
+        try:
+            self.futures.remove(future)
+        except ValueError:
+            pass
+
+
+def _schedule(loops, callback):
+    current = _running_loop()
+    for loop in loops:
+        if loop is current:
+            loop.call_soon(callback, loop)
+        else:
+            loop.call_soon_threadsafe(callback, loop)
+
+
+class BridgeQueue:
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._thread_waiters = 0
+        self._async = _AsyncWaiters()
+        self.wakeups = 0                    # loop wake ups scheduled, for the benchmark
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        self.put_many((item,))
+
+    def put_many(self, items):
+        with self._lock:
+            self._items.extend(items)
+            if self._thread_waiters:
+                self._not_empty.notify(len(self._items))
+            loops = self._async.loops_to_wake() if self._async.futures else ()
+            self.wakeups += len(loops)
+        _schedule(loops, self._wake_async)
+
+    def _wake_async(self, loop):
+        """Runs in `loop`: hand the items to the coroutines of that loop waiting for them"""
+        with self._lock:
+            self._async.scheduled.discard(loop)
+            remaining = deque()
+            while self._async.futures:
+                future = self._async.futures.popleft()
+                if future.done():               # cancelled
+                    continue
+                if future.get_loop() is not loop or not self._items:
+                    remaining.append(future)
+                    continue
+                future.set_result(self._items.popleft())
+            self._async.futures = remaining
+
+    def get(self, timeout=None):
+        """Blocking get, for threads. Raises queue.Empty after `timeout` seconds"""
+        with self._lock:
+            self._thread_waiters += 1
+            try:
+                if not self._not_empty.wait_for(lambda: self._items, timeout):
+                    raise queue.Empty
+            finally:
+                self._thread_waiters -= 1
+            return self._items.popleft()
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    async def async_get(self):
+        with self._lock:
+            if self._items and not self._async.futures:
+                return self._items.popleft()
+            future = asyncio.get_running_loop().create_future()
+            self._async.futures.append(future)
+            # items waiting only behind coroutines of another loop: nothing would wake this one up otherwise
+            loops = self._async.loops_to_wake() if self._items else ()
+        _schedule(loops, self._wake_async)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not future.cancelled():
+                    # handed over just as we were cancelled: put it back, and pass it on to the next waiter
+                    self._items.appendleft(future.result())
+                    if self._thread_waiters:
+                        self._not_empty.notify()
+                    loops = self._async.loops_to_wake()
+                else:
+                    self._async.discard(future)
+                    loops = ()
+            _schedule(loops, self._wake_async)
+            raise
+
+    async def async_get_batch(self, max_items=1024):
+        """Wait for at least one item, then return every item available, up to `max_items`"""
+        first = await self.async_get()
+        with self._lock:
+            batch = [first]
+            items = self._items
+            while items and len(batch) < max_items:
+                batch.append(items.popleft())
+        return batch
+
+
+class BridgeEvent:
+    def __init__(self):
+        self._flag = False
+        self._lock = threading.Lock()
+        self._set = threading.Condition(self._lock)
+        self._async = _AsyncWaiters()
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        with self._lock:
+            if self._flag:
+                return
+            self._flag = True
+            self._set.notify_all()
+            loops = self._async.loops_to_wake()
+        _schedule(loops, self._wake_async)
+
+    def clear(self):
+        with self._lock:
+            self._flag = False
+
+    def _wake_async(self, loop):
+        with self._lock:
+            self._async.scheduled.discard(loop)
+            remaining = deque()
+            for future in self._async.futures:
+                if future.get_loop() is not loop:
+                    remaining.append(future)
+                elif not future.done():
+                    future.set_result(True)
+            self._async.futures = remaining
+
+    def wait(self, timeout=None):
+        """Block the calling thread until the event is set, return False after `timeout` seconds"""
+        with self._lock:
+            return self._set.wait_for(lambda: self._flag, timeout)
+
+    async def async_wait(self):
+        with self._lock:
+            if self._flag:
+                return True
+            future = asyncio.get_running_loop().create_future()
+            self._async.futures.append(future)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            with self._lock:
+                self._async.discard(future)
+            raise
+
+
+# ----- Benchmark: items sent from a thread to a coroutine
+
+def benchmark(items=50000, batch=100):
+    def call_soon_threadsafe_put():
+        async def main():
+            loop, q = asyncio.get_running_loop(), asyncio.Queue()
+
+            def producer():
+                for i in range(items):
+                    loop.call_soon_threadsafe(q.put_nowait, i)
+
+            thread = threading.Thread(target=producer)
+            thread.start()
+            for _ in range(items):
+                await q.get()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)     # never block the loop
+        asyncio.run(main())
+
+    def run_coroutine_threadsafe_put():
+        async def main():
+            loop, q = asyncio.get_running_loop(), asyncio.Queue()
+
+            def producer():
+                for i in range(items):
+                    asyncio.run_coroutine_threadsafe(q.put(i), loop).result()     # a round trip per item
+
+            thread = threading.Thread(target=producer)
+            thread.start()
+            for _ in range(items):
+                await q.get()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        asyncio.run(main())
+
+    def bridge_put():
+        async def main():
+            q = BridgeQueue()
+            thread = threading.Thread(target=lambda: [q.put(i) for i in range(items)])
+            thread.start()
+            for _ in range(items):
+                await q.async_get()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            return q.wakeups
+        return asyncio.run(main())
+
+    def bridge_put_many():
+        async def main():
+            q = BridgeQueue()
+
+            def producer():
+                for start in range(0, items, batch):
+                    q.put_many(range(start, min(items, start + batch)))
+
+            thread = threading.Thread(target=producer)
+            thread.start()
+            received = 0
+            while received < items:
+                received += len(await q.async_get_batch())
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            return q.wakeups
+        return asyncio.run(main())
+
+    print('{} items from a thread to a coroutine'.format(items))
+    for name, run in [('call_soon_threadsafe(Queue.put_nowait)', call_soon_threadsafe_put),
+                      ('run_coroutine_threadsafe(Queue.put)', run_coroutine_threadsafe_put),
+                      ('BridgeQueue.put / async_get', bridge_put),
+                      ('BridgeQueue.put_many / async_get_batch', bridge_put_many)]:
+        start = time.perf_counter()
+        wakeups = run()
+        elapsed = time.perf_counter() - start
+        print('{:<40} {:>10,.0f} items/s{}'.format(name, items / elapsed,
+                                                   '' if wakeups is None else ', {} loop wake ups'.format(wakeups)))
+
+
+def demo():
+    async def main():
+        loop = asyncio.get_running_loop()
+        results, done = BridgeQueue(), BridgeEvent()
+
+        def job(i):
+            time.sleep(0.01 * i)
+            results.put('result of job {}'.format(i))       # straight from the executor thread, no loop reference
+
+        jobs = [loop.run_in_executor(None, job, i) for i in range(3)]
+        for _ in jobs:
+            print(await results.async_get())
+        await asyncio.gather(*jobs)
+
+        waiter = threading.Thread(target=lambda: print('thread saw the event:', done.wait(1)))
+        waiter.start()
+        loop.call_later(0.05, done.set)
+        print('coroutine saw the event:', await done.async_wait())
+        await loop.run_in_executor(None, waiter.join)
+
+    asyncio.run(main())
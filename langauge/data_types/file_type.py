@@ -12,9 +12,15 @@ Calling the file close method terminates your connection to the external file, r
 On the other hand, including manual close calls doesn’t hurt, and may be a good habit to form, especially in long-running systems. Strictly speaking, this auto-close-on-collection feature of files is not part of the language definition—it may change over time, may not happen when you expect it to in interactive shells, and may not work the same in other Python implementations whose garbage collectors may not reclaim and close files at the same points as standard CPython. In fact, when many files are opened within loops, Pythons other than CPython may require close calls to free up system resources immediately, before garbage collection can get around to freeing objects. Moreover, close calls may sometimes be required to flush buffered output of file objects not yet reclaimed. For an alternative way to guarantee automatic file closes, also see this section’s later discussion of the file object’s context manager, used with the with/as statement in Python 2.6, 2.7, and 3.X.
 """
 
+import os
 import sys
 
-file_name = 'data/data.txt'
+from langauge.data_types.output_sink import redirect_output
+from langauge.data_types.streaming_reader import StreamReader
+from langauge.definitions import ROOT_DIR
+
+file_name = os.path.join(ROOT_DIR, 'data/data.txt')
+output_file_name = os.path.join(ROOT_DIR, 'data/outPutData.txt')
 
 def demo():
 
@@ -24,29 +30,43 @@ def demo():
     f.close()                      # Close to flush output buffers to disk
 
     # read from file
-    f = open(file_name)           # 'r' (read) is the default processing mode
-    print('Following is the content of the file - \n', f.read())      # Read entire file into a string
+    with open(file_name) as f:    # 'r' (read) is the default processing mode
+        print('Following is the content of the file - \n', f.read())      # Read entire file into a string
 
     # iterate through each line in the file
-    for line in open(file_name): print("Line : " + line)
+    with open(file_name) as file:
+        for line in file: print("Line : " + line)
 
     # iterate through file char by char
-    file = open(file_name)
-    while True:
-        char = file.read(1)         # Read by character
-        if not char: break          # Empty string means end-of-file
-        print(char, end='')        # Line already has a \n
+    with open(file_name) as file:
+        while True:
+            char = file.read(1)         # Read by character, one call per character: slow on large files
+            if not char: break          # Empty string means end-of-file
+            print(char, end='')        # Line already has a \n
+
+    # same, but the characters are decoded out of large chunks read with readinto() (see streaming_reader.py)
+    with StreamReader(file_name) as reader:
+        for char in reader.chars():
+            print(char, end='')
+    print()
 
 
     print(dir(f))
 
     # Redirecting streams
-    print("test", "test1", "test2", sep='...', end='\n', file=open('data/outPutData.txt', 'w'))
+    with open(output_file_name, 'w') as output:     # one file object for all the prints, not a new one per print
+        print("test", "test1", "test2", sep='...', end='\n', file=output)
 
     temp = sys.stdout
-    sys.stdout = open('data/outPutData.txt', 'a')       # Redirects prints to a file
+    sys.stdout = open(output_file_name, 'a')       # Redirects prints to a file
     print('print this out in file')
     sys.stdout.close()            # Flush output to disk
     sys.stdout = temp
 
+    # same, but scoped to a with block, and the prints are batched in memory and written out in a few large writes
+    # instead of one per print (see output_sink.py)
+    with redirect_output(output_file_name, mode='a'):
+        for i in range(3):
+            print('print this out in file, batched', i)
+
     print('Will output to the standard output/console and NOT the file')
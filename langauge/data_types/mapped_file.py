@@ -0,0 +1,168 @@
+"""
+Memory-mapped files - use the operating system's page cache as the file's buffer, instead of copying it into Python.
+
+f.read() copies the whole file into one bytes (or str) object, so a 2 GB log costs 2 GB of memory before the first
+byte is looked at, on top of the copy the OS already keeps in its page cache. mmap maps the file into the address
+space of the process instead: opening it costs the same for any file size, and a page of the file is only read from
+disk the first time it is touched. Those pages belong to the page cache, so the OS can drop them again under memory
+pressure; nothing is duplicated into the Python heap.
+
+MappedFile exposes the mapping as a memoryview:
+
+*   slicing (mapped[10:20]) returns a memoryview of those bytes, without copying them. bytes(view) makes a copy when
+    one is needed
+*   lines() walks the mapping with mmap.find(b'\\n'), yielding each line as a memoryview
+*   find() / search() look for bytes or a regular expression directly in the mapping: the re module accepts any
+    object supporting the buffer protocol, so a search never builds a copy of the file either
+
+Note: the mapping can only be closed once no memoryview of it is alive any more (mmap raises BufferError otherwise),
+so release the views (view.release(), or simply drop them) before leaving the with block.
+"""
+import mmap
+import os
+import re
+import tempfile
+import time
+
+from langauge.data_types.streaming_reader import generate_file
+
+
+class MappedFile:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b''         # empty files cannot be mapped
+        self.view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.view[index]
+
+    def advise_sequential(self):
+        """Hint the OS to read ahead aggressively, for a front to back scan (Unix, Python 3.8+)"""
+        if self.size and hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def lines(self):
+        """Yield each line, including its b'\\n', as a memoryview of the mapping"""
+        find, view, start = self._map.find, self.view, 0
+        while start < self.size:
+            end = find(b'\n', start)
+            end = self.size if end == -1 else end + 1
+            yield view[start:end]
+            start = end
+
+    def find(self, sub, start=0, end=None):
+        """Offset of the first occurrence of the bytes `sub`, or -1"""
+        if not self.size:
+            return -1
+        return self._map.find(sub, start, self.size if end is None else end)
+
+    def search(self, pattern, flags=0):
+        """Yield (offset, matched bytes) for every match of a bytes regular expression"""
+        for match in re.finditer(pattern, self._map, flags):
+            yield match.start(), match.group()
+
+
+def _rss_mb():
+    # current resident set size, Linux only
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+def benchmark(size_mb=512, needle=b'NEEDLE in the haystack'):
+    path = os.path.join(tempfile.gettempdir(), 'mapped_file_benchmark.txt')
+    generate_file(path, size_mb)
+    with open(path, 'ab') as file:
+        file.write(needle + b'\n')
+    size = os.path.getsize(path)
+    print('{:.0f} MB file, RSS before: {:.0f} MB'.format(size / (1 << 20), _rss_mb()))
+
+    def timed(name, func):
+        rss = _rss_mb()
+        start = time.perf_counter()
+        result, rss_while_open = func()
+        print('{:<34} {:>8.3f}s   RSS +{:>6.0f} MB   -> {}'.format(name, time.perf_counter() - start,
+                                                                    rss_while_open - rss, result))
+
+    # every function returns (result, RSS measured while the data is still held)
+
+    def read_open_and_slice():
+        with open(path, 'rb') as file:
+            data = file.read()
+            return len(data[size // 2:size // 2 + 16]), _rss_mb()
+
+    def mapped_open_and_slice():
+        with MappedFile(path) as mapped:
+            piece = mapped[size // 2:size // 2 + 16]
+            length = len(piece)
+            piece.release()
+            return length, _rss_mb()
+
+    def read_find():
+        with open(path, 'rb') as file:
+            data = file.read()
+            return data.find(needle), _rss_mb()
+
+    def mapped_find():
+        with MappedFile(path) as mapped:
+            return mapped.find(needle), _rss_mb()
+
+    def read_lines():
+        with open(path, 'rb') as file:
+            return sum(1 for _ in file), _rss_mb()
+
+    def mapped_lines():
+        with MappedFile(path) as mapped:
+            mapped.advise_sequential()
+            count = 0
+            for line in mapped.lines():
+                line.release()
+                count += 1
+            return count, _rss_mb()
+
+    # RSS also counts the pages of a mapping that have been touched; unlike the bytes returned by read(), those are
+    # page cache pages the OS can take back at any time
+    try:
+        timed('open().read(), slice 16 bytes', read_open_and_slice)
+        timed('MappedFile, slice 16 bytes', mapped_open_and_slice)
+        timed('open().read().find()', read_find)
+        timed('MappedFile.find()', mapped_find)
+        timed('for line in open()', read_lines)
+        timed('MappedFile.lines()', mapped_lines)
+    finally:
+        os.remove(path)
+
+
+def demo():
+    path = os.path.join(tempfile.gettempdir(), 'mapped_file_demo.txt')
+    with open(path, 'wb') as file:
+        file.write(b'Hello world!\n This is a great time to be alive!\nERROR: the larch\nbye')
+
+    with MappedFile(path) as mapped:
+        print(len(mapped), bytes(mapped[0:5]))
+        print([bytes(line) for line in mapped.lines()])
+        print('"larch" found at', mapped.find(b'larch'))
+        print(list(mapped.search(rb'ERROR: \w+')))
+    os.remove(path)
@@ -0,0 +1,247 @@
+"""
+Output sinks - collect many small writes (e.g. print() calls) in memory and write them out in large batches.
+
+Every write that reaches the OS is a system call. A line buffered or unbuffered file, or a terminal, pays one per
+print(), and opening a new file object per print() as in print(..., file=open(...)) adds an open and a close on top.
+BufferedSink keeps the pieces written to it in a list and hands them to the target file as one string when either:
+
+*   the buffered text reaches `max_buffer` characters, or
+*   `flush_interval` seconds have passed since the last flush (checked by a background thread), so output still shows
+    up promptly when the program is quiet
+
+BufferedSink is a text file object (io.TextIOBase), so it can be passed to print(file=...) or replace sys.stdout. A
+lock guards the buffer, so several threads can print to the same sink; their lines are never interleaved mid-write.
+
+redirect_output(path) redirects sys.stdout to a BufferedSink for the duration of a with block (see
+contextlib.redirect_stdout), flushing and closing it on the way out.
+
+AsyncBufferedSink is the asyncio flavour: write() only appends to the buffer, and the actual file writes run in a
+single thread of its own (via loop.run_in_executor), so a slow disk never blocks the event loop.
+"""
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BufferedSink(io.TextIOBase):
+    def __init__(self, target, max_buffer=64 * 1024, flush_interval=1.0, mode='w', encoding='utf-8'):
+        super().__init__()
+        self._owns_target = isinstance(target, (str, bytes, os.PathLike))
+        self._target = open(target, mode, encoding=encoding) if self._owns_target else target
+        self.max_buffer = max_buffer
+        self._parts = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self.writes = self.flushes = 0
+
+        self._stopped = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    @property
+    def encoding(self):
+        return getattr(self._target, 'encoding', 'utf-8')
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self._lock:
+            self._parts.append(text)
+            self._size += len(text)
+            self.writes += 1
+            if self._size >= self.max_buffer:
+                self._flush_locked()
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _take_locked(self):
+        data = ''.join(self._parts)
+        self._parts = []
+        self._size = 0
+        return data
+
+    def _flush_locked(self):
+        if self._parts:
+            self._target.write(self._take_locked())
+            self._target.flush()
+            self.flushes += 1
+
+    def _flush_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        if self._owns_target:
+            self._target.close()
+        super().close()
+
+
+@contextlib.contextmanager
+def redirect_output(target, **kwargs):
+    """Send everything printed inside the with block to a BufferedSink on `target` (a path or a file object)"""
+    sink = BufferedSink(target, **kwargs)
+    try:
+        with contextlib.redirect_stdout(sink):
+            yield sink
+    finally:
+        sink.close()
+
+
+class AsyncBufferedSink(BufferedSink):
+    """BufferedSink whose flushes run in a dedicated thread, never on the event loop"""
+
+    def __init__(self, target, max_buffer=64 * 1024, flush_interval=1.0, mode='w', encoding='utf-8'):
+        super().__init__(target, max_buffer, flush_interval=None, mode=mode, encoding=encoding)
+        self._flush_interval = flush_interval
+        # one thread, so batches reach the file in the order they were taken from the buffer
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncBufferedSink')
+        self._stopping = False      # the writer thread is shutting down: keep buffering until it is gone
+        self._ticker = None
+
+    async def __aenter__(self):
+        if self._flush_interval:
+            self._ticker = asyncio.ensure_future(self._flush_periodically_async(self._flush_interval))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _write_out(self, data):
+        self._target.write(data)
+        self._target.flush()
+
+    def _flush_locked(self):
+        # called from write() when the buffer is full: hand the batch to the writer thread instead of writing it here
+        if not self._parts or self._stopping:
+            return
+        if self._writer is None:
+            super()._flush_locked()     # closing, the writer thread is gone: write here
+            return
+        self._writer.submit(self._write_out, self._take_locked())
+        self.flushes += 1
+
+    async def aflush(self):
+        """Flush the buffer and wait until the writer thread has written it"""
+        if self._writer is None:
+            return self.flush()
+        with self._lock:
+            data = self._take_locked() if self._parts else None
+            if data:
+                self.flushes += 1
+        if data:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._write_out, data)
+        else:
+            # still wait for batches handed over by write() earlier
+            await asyncio.get_running_loop().run_in_executor(self._writer, lambda: None)
+
+    async def _flush_periodically_async(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.aflush()
+
+    async def aclose(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+        await self.aflush()
+        # waiting for the writer thread to finish blocks, so that happens in a thread too
+        await asyncio.get_running_loop().run_in_executor(None, self._stop_writer)
+        self.close()
+
+    def _stop_writer(self):
+        """Let the writer thread write the batches handed to it, and stop it"""
+        with self._lock:
+            if self._writer is None:
+                return
+            self._stopping = True
+            writer = self._writer
+        writer.shutdown(wait=True)
+        with self._lock:
+            self._writer = None
+            self._stopping = False
+
+    def close(self):
+        # what was written since the last flush is written synchronously, once the batches before it are out
+        self._stop_writer()
+        super().close()
+
+
+def benchmark(lines=100000):
+    """
+    Time printing `lines` lines through the ways file_type.demo used to write files, and through a BufferedSink.
+    How much a system call costs depends a lot on the target: cheap for a file in a RAM disk, much more for a terminal
+    or a network file system
+    """
+    path = os.path.join(tempfile.gettempdir(), 'output_sink_benchmark.txt')
+
+    def file_per_print():
+        for i in range(lines):
+            print('line', i, file=open(path, 'a'))      # as in file_type.demo: a new file object per print
+
+    def write_through():
+        with open(path, 'w', buffering=1) as file:
+            file.reconfigure(write_through=True)        # every write goes straight to the OS
+            for i in range(lines):
+                print('line', i, file=file)
+
+    def line_buffered():
+        with open(path, 'w', buffering=1) as file:      # one write system call per line
+            for i in range(lines):
+                print('line', i, file=file)
+
+    def buffered_sink():
+        with redirect_output(path) as sink:
+            for i in range(lines):
+                print('line', i)
+        return '{} writes batched into {} flushes'.format(sink.writes, sink.flushes)
+
+    try:
+        for name, write in [('print(file=open(...))', file_per_print), ('write through', write_through),
+                            ('line buffered', line_buffered), ('BufferedSink', buffered_sink)]:
+            start = time.perf_counter()
+            details = write()
+            print('{:<22} {:>7.3f}s  {}'.format(name, time.perf_counter() - start, details or ''))
+    finally:
+        os.remove(path)
+
+
+def demo():
+    path = os.path.join(tempfile.gettempdir(), 'output_sink_demo.txt')
+
+    with redirect_output(path, flush_interval=0.1) as sink:
+        for i in range(3):
+            print('printed to the sink', i)
+        threads = [threading.Thread(target=print, args=('from a thread',)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    print('{} writes, {} flushes'.format(sink.writes, sink.flushes))
+
+    async def main():
+        async with AsyncBufferedSink(path, mode='a', flush_interval=0.1) as async_sink:
+            for i in range(3):
+                print('printed from a coroutine', i, file=async_sink)
+                await asyncio.sleep(0.15)
+
+    asyncio.run(main())
+    with open(path) as file:
+        print(file.read())
+    os.remove(path)
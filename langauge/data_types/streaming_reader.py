@@ -0,0 +1,171 @@
+"""
+Streaming reads - process a file of any size in large chunks, with a constant amount of memory.
+
+file.read(1) costs a full method call (plus buffer and decoder bookkeeping) per character, and f.read() holds the whole
+file in memory at once. StreamReader reads the file in big chunks instead and hands out:
+
+*   chunks(): the raw bytes of each chunk. The file is opened unbuffered and read with readinto(), which fills one
+    preallocated bytearray in place: no new bytes object is created per chunk, and the buffer is reused for the whole
+    file. The memoryview yielded is only valid until the next chunk is read, copy it (bytes(view)) to keep it
+*   lines(): decoded text lines, split out of the decoded chunks. Line endings are kept as they are in the file, like
+    open(path, newline='') does
+*   chars(): decoded characters, one at a time, without a read() call per character
+
+Text is decoded with an incremental decoder, which keeps a multi-byte character that is split across two chunks until
+its last byte arrives.
+
+Closing is deterministic: StreamReader is a context manager, and the file is closed when the with block exits, not
+whenever the file object happens to be garbage collected (see the pydoc of file_type.py).
+"""
+import codecs
+import os
+import tempfile
+import time
+
+DEFAULT_CHUNK_SIZE = 1 << 20        # 1 MiB
+
+
+class StreamReader:
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8', errors='strict'):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.errors = errors
+        self._file = open(path, 'rb', buffering=0)     # raw, unbuffered: readinto() goes straight to our buffer
+        self._buffer = bytearray(chunk_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def chunks(self):
+        """Yield a memoryview of each chunk; it is overwritten by the next one"""
+        view = memoryview(self._buffer)
+        while True:
+            size = self._file.readinto(self._buffer)
+            if not size:
+                return
+            yield view[:size]
+
+    def _decoded(self):
+        decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+        for chunk in self.chunks():
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+
+    def lines(self):
+        # the start of a line longer than a chunk is kept as a list of pieces, joined once its end arrives: adding each
+        # chunk to it would copy the whole line again per chunk, quadratic in its length
+        pending = []
+        for text in self._decoded():
+            if '\n' not in text:
+                pending.append(text)
+                continue
+            lines = text.split('\n')
+            if pending:
+                pending.append(lines[0])
+                lines[0] = ''.join(pending)
+            last = lines.pop()          # the last piece has no line end yet
+            pending = [last] if last else []
+            for line in lines:
+                yield line + '\n'
+        if pending:
+            yield ''.join(pending)
+
+    def chars(self):
+        for text in self._decoded():
+            yield from text
+
+
+def generate_file(path, size_mb):
+    line = 'The larch! The quick brown fox jumps over the lazy dog, 0123456789 - ünïcödé\n'.encode('utf-8')
+    block = line * (DEFAULT_CHUNK_SIZE // len(line))
+    with open(path, 'wb') as file:
+        for _ in range(size_mb * (1 << 20) // len(block)):
+            file.write(block)
+
+
+def benchmark(size_mb=256, char_sample_mb=8):
+    """
+    Throughput of the different ways to read a generated `size_mb` MB file. Reading one character per call is so slow
+    that it only reads the first `char_sample_mb` MB
+    """
+    path = os.path.join(tempfile.gettempdir(), 'streaming_reader_benchmark.txt')
+    generate_file(path, size_mb)
+    size = os.path.getsize(path)
+    sample = char_sample_mb * (1 << 20)
+
+    def per_char():
+        with open(path, encoding='utf-8') as file:
+            read = 0
+            while read < sample:
+                if not file.read(1):
+                    break
+                read += 1       # characters, close enough to bytes for this mostly ASCII text
+        return read
+
+    def stream_chars():
+        with StreamReader(path) as reader:
+            read = 0
+            for _ in reader.chars():
+                read += 1
+                if read >= sample:
+                    break
+        return read
+
+    def per_line():
+        with open(path, encoding='utf-8') as file:
+            for _ in file:
+                pass
+        return size
+
+    def stream_lines():
+        with StreamReader(path) as reader:
+            for _ in reader.lines():
+                pass
+        return size
+
+    def stream_chunks():
+        with StreamReader(path) as reader:
+            return sum(len(chunk) for chunk in reader.chunks())
+
+    print('Reading a {:.0f} MB file'.format(size / (1 << 20)))
+    try:
+        for name, read in [('file.read(1)', per_char), ('StreamReader.chars()', stream_chars),
+                           ('for line in file', per_line), ('StreamReader.lines()', stream_lines),
+                           ('StreamReader.chunks()', stream_chunks)]:
+            start = time.perf_counter()
+            amount = read()
+            elapsed = time.perf_counter() - start
+            print('{:<22} {:>10.1f} MB/s'.format(name, amount / (1 << 20) / elapsed))
+    finally:
+        os.remove(path)
+
+
+def demo():
+    path = os.path.join(tempfile.gettempdir(), 'streaming_reader_demo.txt')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Hello world!\n This is a great time to be alive!\nünïcödé')
+
+    # a tiny chunk size, to show that lines and multi-byte characters split across chunks come out whole
+    with StreamReader(path, chunk_size=4) as reader:
+        print([bytes(chunk) for chunk in reader.chunks()][:3])
+    with StreamReader(path, chunk_size=4) as reader:
+        print(list(reader.lines()))
+    with StreamReader(path, chunk_size=4) as reader:
+        print(''.join(reader.chars()))
+    print('closed after the with block:', reader.closed)
+    os.remove(path)
@@ -0,0 +1,108 @@
+"""
+Demo registry - finds every module in the langauge package that defines a top-level demo() function WITHOUT importing it.
+
+Importing a module runs all of its code (see the pydoc of langauge/main.py), and some demos pull in heavy third-party
+libraries like requests or attrs. To keep start up cheap, modules are discovered by parsing their source with the ast
+module, which only compiles the file into a syntax tree and never executes it. A module is imported lazily, the first
+time its demo is selected, and the time spent importing it is recorded so slow imports are easy to spot. That time
+includes the modules it imports that were not loaded yet: a dependency shared by several demos is charged to the first
+one imported, and the others show almost nothing for it.
+
+Demo names are the dotted module path relative to the langauge package, e.g. 'async_io.coroutine'.
+
+A module may also define benchmark(), measuring what its demo shows at a realistic scale. Those take seconds and may
+write hundreds of MB of temporary files, so demo() stays small and benchmark() only runs when asked for:
+run(name, benchmark=True) or `python -m langauge run --benchmark ...`.
+"""
+import ast
+import os
+import time
+from collections import namedtuple
+from importlib import import_module
+
+from langauge.definitions import ROOT_DIR
+
+PACKAGE = 'langauge'
+
+# modules that drive the demos, rather than being demos themselves
+EXCLUDED_MODULES = {'main', '__main__', 'demos'}
+
+Demo = namedtuple('Demo', ['name', 'module_name', 'path', 'doc'])
+
+# module name -> seconds spent in its first import, dependencies included, filled in by load()
+import_times = {}
+
+_registry = None
+
+
+def _defines_demo(path):
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == 'demo':
+            return True, ast.get_docstring(tree)
+    return False, None
+
+
+def discover(root=ROOT_DIR):
+    """Walk the package directory and return {demo name: Demo} for every module that defines demo()"""
+    found = {}
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(d for d in dir_names if not d.startswith(('.', '__')))
+
+        for file_name in sorted(file_names):
+            module, ext = os.path.splitext(file_name)
+            if ext != '.py' or module in EXCLUDED_MODULES:
+                continue
+
+            path = os.path.join(dir_path, file_name)
+            has_demo, doc = _defines_demo(path)
+            if not has_demo:
+                continue
+
+            relative = os.path.relpath(os.path.join(dir_path, module), root)
+            name = relative.replace(os.sep, '.')
+            found[name] = Demo(name, '{}.{}'.format(PACKAGE, name), path, doc)
+    return found
+
+
+def registry():
+    """Discovered demos, cached after the first scan"""
+    global _registry
+    if _registry is None:
+        _registry = discover()
+    return _registry
+
+
+def get(name):
+    try:
+        return registry()[name]
+    except KeyError:
+        raise KeyError('Unknown demo {!r}, available demos are: {}'.format(name, ', '.join(registry()))) from None
+
+
+def load(name):
+    """Import the module behind the given demo, recording how long the import took"""
+    module_name = get(name).module_name
+
+    start = time.perf_counter()
+    module = import_module(module_name)
+    # a module is imported only once per process, so only the first (real) import is worth recording
+    import_times.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+
+def run(name, benchmark=False):
+    """Run the demo, then the module's benchmark() when asked for and the module has one"""
+    module = load(name)
+    result = module.demo()
+    if benchmark and hasattr(module, 'benchmark'):
+        module.benchmark()
+    return result
+
+
+def print_import_report():
+    print('\nImport time per demo module (first import, including dependencies not loaded yet):')
+    for module_name, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        print('{:>10.2f} ms  {}'.format(seconds * 1000, module_name))
@@ -83,6 +83,3 @@ def demo():
 
     with message() as resource:
         resource("test")
-
-
-demo()
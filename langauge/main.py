@@ -28,86 +28,106 @@ The Module Search Path - need to tell Python where to look to find files to impo
 
 It is also possible to create a Python module by writing code in an external language such as C, C++, and others (e.g., Java, in the Jython implementation of the language). Such modules are called extension modules
 """
-import asyncio
-from importlib import reload
-
 import sys  # Load a library module
+from importlib import reload
 
-from langauge import module, shell_commands, data_types
+from langauge import demos, module
 # from module1 import *                   # Copy out all variables in the file (note that this will not copy out variables from multiple python files, just one)
 # from M import func as mfunc    # Rename uniquely with "as"
-from langauge.async_io import coroutine, event_loop, async_io, future_and_tasks, async_with, run_in_executor, \
-    async_for_and_async_comphrension, executor_takes_too_long
-from langauge.data_types import basic_types, collection_types, x_in_package_init
-from langauge.data_types import file_type
-from langauge.package1 import utility as pkg1_util
-from langauge.package2 import utility as pkg2_util
 
-reload(module)  # reload module
+# Demos run by default, in order. Every other demo is still discovered by langauge.demos and can be selected by name, e.g.
+# python -m langauge.main threads.locks
+# Modules are only imported when their demo is selected, so running a single demo costs only that demo's imports.
+DEFAULT_DEMOS = [
+    'data_types.basic_types',
+    'data_types.collection_types',
+    'data_types.file_type',
+    'shell_commands',
+    'async_io.async_io',
+    'async_io.coroutine',
+    'async_io.event_loop',
+    'async_io.future_and_tasks',
+    'async_io.async_with',
+    'async_io.run_in_executor',
+    'async_io.async_for_and_async_comphrension',
+    'async_io.executor_takes_too_long',
+]
 
-print('Module search path - ', sys.path)
-print('Namespace of the module - ', module.__dict__.keys())
 
-# commenting out line below so that it does not get removed while optimizing imports
-# from module import var1     from copies a module’s attributes, such that they become simple variables in the recipient
+def intro():
+    from langauge import data_types
+    from langauge.data_types import x_in_package_init
+    from langauge.package1 import utility as pkg1_util
+    from langauge.package2 import utility as pkg2_util
 
-var1 = "This will overridden var1 reference by the by the 'import from' statement above!"
+    reload(module)  # reload module
 
-print(sys.platform)
-print(module.var1, var1)
+    print('Module search path - ', sys.path)
+    print('Namespace of the module - ', module.__dict__.keys())
 
-'''
-`python -m pydoc -b` command to start browser only mode of PyDoc. The effect is to start PyDoc as a locally running web server on a dedicated (but by default arbitrary unused) port, and pop up
- a web browser to act as client, displaying a page giving links to documentation for all the modules importable on your module search path (including the directory where PyDoc is launched).
- 
- If you ask for documentation for a top-level script file, though, the shell window where you launched PyDoc serves as the script’s standard input and output for any user interaction. The net effect is that the documentation page for a script will appear AFTER IT RUNS THE SCRIPT, AND AFTER ITS PRINTED OUTPUT SHOWS UP IN THE SHELL WINDOW.
-'''
-print('Pydoc for module - ', module.__doc__)  # print out pydoc for the module called 'module'
+    # commenting out line below so that it does not get removed while optimizing imports
+    # from module import var1     from copies a module’s attributes, such that they become simple variables in the recipient
 
-'''
-Weak Reference - implemented by the weakref standard library module, is a reference to an object that does not by itself prevent the referenced object from being garbage-collected. 
-If the last remaining references to an object are weak references, the object is reclaimed and the weak references to it are automatically deleted (or otherwise notified).
-'''
-print("sys.getrefcount(1) = ", sys.getrefcount(
-    1))  # Python garbage collects an object as soon as its reference count goes to 0, python caches values like ints
+    var1 = "This will overridden var1 reference by the by the 'import from' statement above!"
 
-aString = ''
+    print(sys.platform)
+    print(module.var1, var1)
 
-print(dir(aString))  # dir() attempts to return all attributes of this object
-print(help(aString.replace))  # Get info on a specific attribute
-print(dir(
-    str))  # Both dir and help also accept as arguments either a real object (like our string S), or the name of a data type (like str, list, and dict)
-print(dir(str.replace))
+    '''
+    `python -m pydoc -b` command to start browser only mode of PyDoc. The effect is to start PyDoc as a locally running web server on a dedicated (but by default arbitrary unused) port, and pop up
+     a web browser to act as client, displaying a page giving links to documentation for all the modules importable on your module search path (including the directory where PyDoc is launched).
 
-basic_types.demo()
-collection_types.demo()
-file_type.demo()
+     If you ask for documentation for a top-level script file, though, the shell window where you launched PyDoc serves as the script’s standard input and output for any user interaction. The net effect is that the documentation page for a script will appear AFTER IT RUNS THE SCRIPT, AND AFTER ITS PRINTED OUTPUT SHOWS UP IN THE SHELL WINDOW.
+    '''
+    print('Pydoc for module - ', module.__doc__)  # print out pydoc for the module called 'module'
 
-print('var in package init file - ', x_in_package_init)
-print('var in package init file - ', data_types.x_in_package_init)
-print('reload imported directory / package - ', reload(data_types))
+    '''
+    Weak Reference - implemented by the weakref standard library module, is a reference to an object that does not by itself prevent the referenced object from being garbage-collected.
+    If the last remaining references to an object are weak references, the object is reclaimed and the weak references to it are automatically deleted (or otherwise notified).
+    '''
+    print("sys.getrefcount(1) = ", sys.getrefcount(
+        1))  # Python garbage collects an object as soon as its reference count goes to 0, python caches values like ints
 
-pkg1_util.printing_fun()
-pkg2_util.printing_fun()
+    aString = ''
 
-shell_commands.demo()
+    print(dir(aString))  # dir() attempts to return all attributes of this object
+    print(help(aString.replace))  # Get info on a specific attribute
+    print(dir(
+        str))  # Both dir and help also accept as arguments either a real object (like our string S), or the name of a data type (like str, list, and dict)
+    print(dir(str.replace))
+
+    print('var in package init file - ', x_in_package_init)
+    print('var in package init file - ', data_types.x_in_package_init)
+    print('reload imported directory / package - ', reload(data_types))
+
+    pkg1_util.printing_fun()
+    pkg2_util.printing_fun()
 
 
 # helper method
 def create_new_event_loop():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    return loop
-
-
-async_io.demo()
-coroutine.demo()
-event_loop.demo()
-create_new_event_loop()
-future_and_tasks.demo()
-async_with.demo()
-run_in_executor.demo()
-async_for_and_async_comphrension.demo()
-executor_takes_too_long.demo()
-
-print('\n\nDone!')
+    # imported here so that non-async demos do not pay for asyncio
+    from langauge.async_io.loop_factory import set_up_demo_loop
+
+    return set_up_demo_loop()   # implementation picked by LANGAUGE_EVENT_LOOP, see loop_factory.py
+
+
+def main(names=None):
+    if not names:
+        intro()
+
+    for name in names or DEFAULT_DEMOS:
+        if name.startswith('async_io.'):
+            # demos calling asyncio.run() leave no current event loop behind, give each async demo a fresh one
+            create_new_event_loop()
+        demos.run(name)
+
+    if 'asyncio' in sys.modules:
+        from langauge.async_io.loop_factory import close_demo_loop
+        close_demo_loop()
+    demos.print_import_report()
+    print('\n\nDone!')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
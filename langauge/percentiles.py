@@ -0,0 +1,13 @@
+"""
+Percentiles of latency samples, shared by the modules reporting them in their stats() / metrics().
+
+percentile() takes the samples already sorted, so a caller asking for several percentiles of the same samples sorts
+them once. It uses the nearest-rank method: the result is always one of the samples, no interpolation.
+"""
+
+
+def percentile(ordered, fraction):
+    """The sample below which `fraction` (0.0 to 1.0) of the sorted samples `ordered` fall, 0.0 when there are none"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,212 @@
+"""
+Process pool offload for CPU-bound work, with results returned through shared memory.
+
+Threads do not help CPU-bound Python code: only the thread holding the GIL runs bytecode, so the ThreadBots in
+race_condition.py take turns rather than running in parallel. Processes each have their own interpreter and GIL, and
+concurrent.futures.ProcessPoolExecutor spreads calls over one worker process per core.
+
+The price is that arguments and results travel between processes as pickles: a result of ten million floats is
+serialized in the worker, pushed through a pipe and rebuilt in the parent. multiprocessing.shared_memory (Python 3.8+)
+avoids that: the parent allocates one block of shared memory, each worker attaches to it by name and writes its slice
+of the result in place, and the parent reads the numbers straight out of the block through a memoryview. Only the
+block's name and the slice bounds are pickled.
+
+CpuPool.fill(func, length) computes `func(start, stop)` for consecutive slices of range(length) across the workers;
+func must return the values of its slice (any sequence or iterable of numbers) and, like everything sent to a process
+pool, be defined at the top level of a module so that it can be pickled by reference.
+
+CpuPool.fill_async() does the same from a coroutine: the slices are handed to the pool with loop.run_in_executor(), so
+the event loop keeps running other tasks while the workers compute (see langauge/async_io/run_in_executor.py). In a
+coroutine, use `async with CpuPool() as pool:`: shutting the pool down waits for its worker processes to exit, which
+then happens in a thread rather than on the event loop.
+
+If fill() is interrupted (or fill_async() cancelled) before the workers are done, the shared memory block is freed
+right away; it is not left behind in /dev/shm.
+"""
+import asyncio
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+
+class SharedArray:
+    """A numeric array living in a shared memory block, readable without copying through `values` (a memoryview)"""
+
+    def __init__(self, length, typecode='d', name=None):
+        itemsize = array(typecode).itemsize
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, length * itemsize))
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.length = length
+        self.typecode = typecode
+        self.values = self._shm.buf[:length * itemsize].cast(typecode)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def tolist(self):
+        return self.values.tolist()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def close(self):
+        """Detach from the block, leaving it to other processes"""
+        self.values.release()
+        self._shm.close()
+
+    def release(self):
+        """Detach from the block and free it; call once, from the process that created the array"""
+        self.close()
+        self._shm.unlink()
+
+
+def _fill_slice(name, length, typecode, func, start, stop):
+    # runs in a worker process
+    shared = SharedArray(length, typecode, name=name)
+    try:
+        shared.values[start:stop] = array(typecode, func(start, stop))
+    finally:
+        shared.close()
+    return stop - start
+
+
+def _slices(length, chunks):
+    step = max(1, -(-length // chunks))
+    return [(start, min(start + step, length)) for start in range(0, length, step)]
+
+
+class CpuPool:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.ashutdown()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    async def ashutdown(self):
+        """shutdown(), waiting for the workers to exit in a thread instead of on the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+
+    def submit(self, func, *args):
+        return self.executor.submit(func, *args)
+
+    def fill(self, func, length, typecode='d', chunks=None):
+        """Return a SharedArray of `length` items, slice [start:stop] computed by func(start, stop) in a worker"""
+        result = SharedArray(length, typecode)
+        futures = []
+        try:
+            futures.extend(self.executor.submit(_fill_slice, result.name, length, typecode, func, start, stop)
+                           for start, stop in _slices(length, chunks or self.max_workers * 4))
+            wait(futures)
+        except BaseException:           # e.g. KeyboardInterrupt while waiting: do not leak the block
+            self._abandon(result, futures)
+            raise
+        return self._checked(result, futures)
+
+    async def fill_async(self, func, length, typecode='d', chunks=None):
+        """fill(), awaitable from a coroutine without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        result = SharedArray(length, typecode)
+        futures = []
+        try:
+            futures.extend(loop.run_in_executor(self.executor, _fill_slice, result.name, length, typecode, func, start,
+                                                stop)
+                           for start, stop in _slices(length, chunks or self.max_workers * 4))
+            await asyncio.wait(futures)
+        except BaseException:           # cancelled while waiting: do not leak the block
+            self._abandon(result, futures)
+            raise
+        return self._checked(result, futures)
+
+    @staticmethod
+    def _abandon(result, futures):
+        # slices not started yet are dropped; workers already writing keep their own mapping of the block, which
+        # lives on until they detach, unlinking only removes its name
+        for future in futures:
+            future.cancel()
+        result.release()
+
+    @staticmethod
+    def _checked(result, futures):
+        for future in futures:
+            if future.exception() is not None:
+                result.release()
+                raise future.exception()
+        return result
+
+
+# ----- CPU-bound work used by the demo, defined at module level so that it can be sent to the workers
+
+def collatz_steps(start, stop):
+    """Number of Collatz steps to reach 1, for every number in [start, stop)"""
+    steps = []
+    for n in range(start, stop):
+        count = 0
+        while n > 1:
+            n = n // 2 if n % 2 == 0 else 3 * n + 1
+            count += 1
+        steps.append(count)
+    return steps
+
+
+def benchmark(length=300000):
+    start = time.perf_counter()
+    expected = collatz_steps(0, length)
+    print('one process:               {:.2f}s'.format(time.perf_counter() - start))
+
+    with CpuPool() as pool:
+        pool.submit(abs, 0).result()        # start the workers before timing
+
+        start = time.perf_counter()
+        pickled = []
+        for future in [pool.submit(collatz_steps, a, b) for a, b in _slices(length, pool.max_workers * 4)]:
+            pickled.extend(future.result())
+        print('{} workers, pickled:       {:.2f}s'.format(pool.max_workers, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        with pool.fill(collatz_steps, length, typecode='l') as shared:
+            print('{} workers, shared memory: {:.2f}s'.format(pool.max_workers, time.perf_counter() - start))
+            assert shared.tolist() == expected == pickled
+
+
+def demo():
+    async def ticker():
+        while True:
+            print('tick - the event loop is free while the workers compute')
+            await asyncio.sleep(0.2)
+
+    async def main():
+        ticking = asyncio.ensure_future(ticker())
+        async with CpuPool() as pool:       # shut down without blocking the loop
+            with await pool.fill_async(collatz_steps, 200000, typecode='l') as steps:
+                longest = max(range(len(steps)), key=steps.__getitem__)
+                print('{} takes the most steps under 200000: {}'.format(longest, steps[longest]))
+        ticking.cancel()
+
+    asyncio.run(main())
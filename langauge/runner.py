@@ -0,0 +1,118 @@
+"""
+Runs demos in isolated child interpreters, several at a time.
+
+Most demos spend their time sleeping (time.sleep, asyncio.sleep) rather than computing, so running them one after
+another mostly waits. Each demo here gets its own process: one demo's globals, event loop, threads or a crash cannot
+leak into another, and its stdout is captured on its own pipe instead of being interleaved with the others. The
+parent only waits on the children, so a thread per running child is plenty; the children themselves run on as many
+cores as are available. The wall time of the whole run therefore approaches the wall time of the slowest demo.
+
+CPU time is reported by the child itself (time.process_time() covers all threads of the child) on a marked line of
+its stderr, which works the same way on every platform.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langauge import demos
+from langauge.definitions import ROOT_DIR
+
+_TIMING_MARKER = '__demo_timing__'
+
+# async demos get the event loop set up main.py gives them (see loop_factory.set_up_demo_loop)
+_CHILD_CODE = '''
+import json, sys, time
+from langauge import demos
+try:
+    if sys.argv[1].startswith('async_io.'):
+        from langauge.async_io.loop_factory import set_up_demo_loop
+        set_up_demo_loop()
+    demos.run(sys.argv[1], benchmark=sys.argv[2:] == ['--benchmark'])
+finally:
+    sys.stdout.flush()
+    sys.stderr.write('\\n{marker}' + json.dumps({{'cpu': time.process_time()}}) + '\\n')
+'''.format(marker=_TIMING_MARKER)
+
+Result = namedtuple('Result', ['name', 'status', 'wall', 'cpu', 'stdout', 'stderr'])
+
+
+def _child_env():
+    env = dict(os.environ)
+    # the children run from inside the package directory (demos use paths like 'data/data.txt'), so the directory
+    # holding the package has to be on their module search path
+    project_dir = os.path.dirname(ROOT_DIR)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [project_dir, env.get('PYTHONPATH')]))
+    env['PYTHONUNBUFFERED'] = '1'
+    return env
+
+
+def _split_timing(stderr):
+    head, marker, tail = stderr.rpartition(_TIMING_MARKER)
+    if not marker:
+        return stderr, None
+    # a traceback of a failing demo is printed after the finally clause that wrote the timing line
+    timing, _, rest = tail.partition('\n')
+    return head.rstrip('\n') + '\n' + rest, json.loads(timing)['cpu']
+
+
+def run_demo(name, timeout=None, benchmark=False):
+    """Run one demo (and its benchmark() when `benchmark` is true) in a fresh interpreter and return its Result"""
+    demos.get(name)     # fail fast on unknown names, before paying for a process
+
+    start = time.perf_counter()
+    try:
+        args = [sys.executable, '-c', _CHILD_CODE, name] + (['--benchmark'] if benchmark else [])
+        completed = subprocess.run(args, cwd=ROOT_DIR, env=_child_env(),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout,
+                                   universal_newlines=True, encoding='utf-8', errors='replace')
+    except subprocess.TimeoutExpired as e:
+        wall = time.perf_counter() - start
+        stdout = e.stdout.decode('utf-8', 'replace') if isinstance(e.stdout, bytes) else (e.stdout or '')
+        stderr = e.stderr.decode('utf-8', 'replace') if isinstance(e.stderr, bytes) else (e.stderr or '')
+        return Result(name, 'timeout', wall, None, stdout, stderr)
+
+    wall = time.perf_counter() - start
+    stderr, cpu = _split_timing(completed.stderr)
+    status = 'ok' if completed.returncode == 0 else 'failed ({})'.format(completed.returncode)
+    return Result(name, status, wall, cpu, completed.stdout, stderr)
+
+
+def run_demos(names, jobs=None, timeout=None, on_result=None, benchmark=False):
+    """Run the given demos, up to `jobs` at a time, returning their Results in the order they were asked for"""
+    jobs = jobs or os.cpu_count() or 1
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_demo, name, timeout, benchmark): name for name in names}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.name] = result
+            if on_result:
+                on_result(result)
+
+    return [results[name] for name in names]
+
+
+def print_output(result):
+    print('\n===== {} ({}) ====='.format(result.name, result.status))
+    print(result.stdout, end='' if result.stdout.endswith('\n') else '\n')
+    if result.stderr.strip():
+        print('----- stderr -----')
+        print(result.stderr)
+
+
+def print_summary(results, wall):
+    width = max([len('demo')] + [len(result.name) for result in results])
+    row = '{:<%d}  {:<12}  {:>9}  {:>9}' % width
+
+    print('\n' + row.format('demo', 'status', 'wall (s)', 'cpu (s)'))
+    print(row.format('-' * width, '-' * 12, '-' * 9, '-' * 9))
+    for result in results:
+        cpu = '-' if result.cpu is None else '{:.3f}'.format(result.cpu)
+        print(row.format(result.name, result.status, '{:.3f}'.format(result.wall), cpu))
+
+    print('\nTotal wall time {:.3f}s, sum of demo wall times {:.3f}s'.format(wall, sum(r.wall for r in results)))
@@ -0,0 +1,157 @@
+"""
+AdaptiveLock - try the lock a few times before going to sleep on it, with a self tuning number of tries.
+
+When a thread finds a Lock taken, acquire() puts it to sleep in the kernel, and waking it up again when the lock is
+released costs a system call and a trip through the OS scheduler. For critical sections of a few instructions, such as
+Cutlery.change() in race_condition.py, the lock is usually free again well before that round trip is over. An
+adaptive lock first spins: it retries a non-blocking acquire, and only blocks once the spin budget is used up.
+
+Spinning in Python differs from spinning in C in one way: while a thread spins it holds the GIL, so the thread
+holding the lock cannot run and release it. Each spin therefore gives the GIL up: the first one with time.sleep(0),
+which only yields, the next ones sleep exponentially longer (`min_backoff`, doubling up to `max_backoff`), so a thread
+waiting behind a longer critical section retries less and less often before it blocks.
+
+The spin budget tunes itself:
+
+*   an acquisition that succeeds while spinning pulls the budget towards twice the number of spins it needed
+*   an acquisition that spins the whole budget in vain, and then blocks, lowers it by one. A gentler decrease than
+    halving: contended acquisitions are rare, and one unlucky acquisition should not undo what the others learned.
+    With many threads, the thread that yields the GIL rarely hands it to the lock holder. Spins then keep failing and
+    the budget settles at 1, which is the right answer for that workload
+*   when the lock is held for long on average (longer than `spin_hold_limit`), spinning cannot pay off and the budget
+    drops to its minimum of 1, so the lock keeps probing whether things changed
+
+stats() reports the acquisitions taken without waiting, after spinning, and after blocking, the spins made, the current
+budget and the average hold time, sampled on one acquisition out of HOLD_SAMPLE whichever way it was acquired. The
+counters are updated while the lock is held, so they need no lock of their own.
+
+Measure before adopting it: threading.Lock is implemented in C, and every Python level instruction added to the
+uncontended path (which most acquisitions take) costs more than a short sleep in the kernel saves, see benchmark().
+"""
+import sys
+import threading
+import time
+
+
+class AdaptiveLock:
+    HOLD_SAMPLE = 16        # the hold time is measured on one acquisition out of HOLD_SAMPLE, timing is not free
+
+    def __init__(self, max_spins=64, spin_hold_limit=50e-6, min_backoff=1e-6, max_backoff=50e-6):
+        self._lock = threading.Lock()
+        self.max_spins = max_spins
+        self.spin_hold_limit = spin_hold_limit
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._budget = min(8, max_spins)
+        self._hold = 0.0                    # moving average of the sampled hold times
+        self._acquired_at = None            # set when this acquisition is one of the sampled ones
+        self.acquisitions = self.spun = self.blocked = self.spins = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            if not self.acquisitions % self.HOLD_SAMPLE:
+                self._acquired_at = time.perf_counter()
+            return True
+        if not blocking:
+            return False
+        return self._acquire_contended(timeout)
+
+    def _acquire_contended(self, timeout):
+        acquire = self._lock.acquire
+        start = time.perf_counter()
+        budget = self._budget
+        delay = 0.0                         # the first spin only yields the GIL
+        for spins in range(1, budget + 1):
+            time.sleep(delay)               # let the holder run
+            if acquire(False):
+                self.spun += 1
+                self.spins += spins
+                # pull the budget towards twice the spins this acquisition needed
+                self._budget = max(1, min(self.max_spins, (self._budget + 2 * spins) // 2))
+                self._count_acquisition()
+                return True
+            delay = min(self.max_backoff, delay * 2 or self.min_backoff)
+
+        if timeout >= 0:
+            timeout = max(0.0, timeout - (time.perf_counter() - start))
+        if not acquire(True, timeout):
+            return False
+        self.blocked += 1
+        self.spins += budget
+        self._budget = max(1, self._budget - 1)
+        self._count_acquisition()
+        return True
+
+    def _count_acquisition(self):
+        self.acquisitions += 1
+        if not self.acquisitions % self.HOLD_SAMPLE:
+            self._acquired_at = time.perf_counter()
+
+    def release(self):
+        acquired_at = self._acquired_at
+        if acquired_at is not None:
+            self._acquired_at = None
+            self._hold += (time.perf_counter() - acquired_at - self._hold) / 4
+            if self._hold > self.spin_hold_limit:
+                self._budget = 1
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def stats(self):
+        return {'acquisitions': self.acquisitions, 'uncontended': self.acquisitions - self.spun - self.blocked,
+                'spun': self.spun, 'blocked': self.blocked, 'spins': self.spins, 'budget': self._budget,
+                'average_hold': self._hold}
+
+
+# ----- Benchmark on the ThreadBot workload of race_condition.py
+
+def benchmark(thread_counts=(2, 4, 8, 16, 32), tables=5000):
+    from langauge.threads.sharded_counter import ClassLockCutlery, run_service
+
+    class AdaptiveLockCutlery(ClassLockCutlery):
+        """ClassLockCutlery with an AdaptiveLock as its class lock"""
+        lock = AdaptiveLock()
+
+    # a short switch interval makes threads preempt each other inside the critical section, creating contention
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        print('{:<8} {:>16} {:>16}   {}'.format('threads', 'Lock changes/s', 'Adaptive', 'AdaptiveLock stats'))
+        for threads in thread_counts:
+            rates = []
+            AdaptiveLockCutlery.lock = AdaptiveLock()
+            for variant in (ClassLockCutlery, AdaptiveLockCutlery):
+                inventory, elapsed = run_service(variant, threads, tables)
+                assert inventory == {'knives': 100, 'forks': 100}, inventory
+                rates.append(threads * tables * 4 / elapsed)
+            stats = AdaptiveLockCutlery.lock.stats()
+            print('{:<8} {:>16,.0f} {:>16,.0f}   uncontended {uncontended}, spun {spun}, blocked {blocked}, '
+                  'budget {budget}, average hold {hold_us:.1f} us'.format(threads, *rates,
+                                                                         hold_us=stats['average_hold'] * 1e6, **stats))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def demo():
+    lock = AdaptiveLock()
+    counter = [0]
+
+    def work():
+        for _ in range(10000):
+            with lock:
+                counter[0] += 1
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(counter[0], lock.stats())
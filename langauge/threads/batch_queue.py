@@ -0,0 +1,125 @@
+"""
+BatchQueue - a thread safe FIFO queue that moves whole lists of items per locked operation.
+
+queue.Queue takes its mutex and notifies a Condition for every single put() and get(). When a ThreadBot in
+race_condition.py is handed 200,000 tasks, that overhead is paid 200,000 times on each side, and it dwarfs the work done
+per task. BatchQueue keeps the same lock + Condition design (see conditions.py), but:
+
+*   put_many(items) appends any number of items under one lock acquisition and one notify
+*   get_batch() removes up to `max_batch` items under one lock acquisition
+
+Linger: a consumer that finds only a few items may wait up to `linger` seconds for more to arrive, trading a little
+latency for fuller batches. linger=0 (the default) returns whatever is available right away.
+
+put() and get() are kept for single items, so BatchQueue can stand in for queue.Queue.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+
+class BatchQueue:
+    def __init__(self, max_batch=1024, linger=0.0):
+        self.max_batch = max_batch
+        self.linger = linger
+        self._items = deque()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._not_empty:
+            self._items.append(item)
+            self._not_empty.notify()
+
+    def put_many(self, items):
+        with self._not_empty:
+            before = len(self._items)
+            self._items.extend(items)
+            added = len(self._items) - before
+            if added:
+                self._not_empty.notify(added)
+
+    def get_batch(self, max_batch=None, linger=None, timeout=None):
+        """
+        Wait until at least one item is queued (or raise queue.Empty after `timeout` seconds), linger for more, and
+        return up to `max_batch` items as a list
+        """
+        max_batch = max_batch or self.max_batch
+        linger = self.linger if linger is None else linger
+
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+
+            if linger > 0 and len(self._items) < max_batch:
+                deadline = time.monotonic() + linger
+                while len(self._items) < max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+
+            items = self._items
+            if len(items) <= max_batch:
+                self._items = deque()
+                return list(items)
+            return [items.popleft() for _ in range(max_batch)]
+
+    def get(self, timeout=None):
+        return self.get_batch(1, linger=0, timeout=timeout)[0]
+
+
+def _consume_one_by_one(tasks):
+    while tasks.get() != 'shutdown':
+        pass
+
+
+def _consume_batches(tasks):
+    while True:
+        for task in tasks.get_batch():
+            if task == 'shutdown':
+                return
+
+
+def benchmark(tasks=200000):
+    """Time how long it takes to hand `tasks` tasks over to a consumer thread, the way ThreadBots are fed"""
+    work = ['prepare table', 'clear table'] * (tasks // 2)
+
+    def timed(tasks_queue, feed, consume):
+        consumer = threading.Thread(target=consume, args=(tasks_queue,))
+        start = time.perf_counter()
+        consumer.start()
+        feed(tasks_queue)
+        consumer.join()
+        return time.perf_counter() - start
+
+    def feed_one_by_one(tasks_queue):
+        for task in work:
+            tasks_queue.put(task)
+        tasks_queue.put('shutdown')
+
+    def feed_in_batches(tasks_queue):
+        for i in range(0, len(work), 1024):
+            tasks_queue.put_many(work[i:i + 1024])
+        tasks_queue.put('shutdown')
+
+    for name, seconds in [
+        ('queue.Queue put/get', timed(queue.Queue(), feed_one_by_one, _consume_one_by_one)),
+        ('BatchQueue put/get', timed(BatchQueue(), feed_one_by_one, _consume_one_by_one)),
+        ('BatchQueue batches', timed(BatchQueue(), feed_in_batches, _consume_batches)),
+    ]:
+        print('{:<22} {:>8.3f}s  {:>8.2f} us per task'.format(name, seconds, seconds / len(work) * 1e6))
+
+
+def demo():
+    tasks = BatchQueue(max_batch=4, linger=0.05)
+    tasks.put_many(range(6))
+    print(tasks.get_batch(), tasks.get_batch())
+
+    threading.Timer(0.01, tasks.put_many, args=([6, 7, 8],)).start()
+    tasks.put(5)
+    # lingers until the timer above brings the batch up to 4 items
+    print(tasks.get_batch())
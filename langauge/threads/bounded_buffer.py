@@ -0,0 +1,173 @@
+"""
+RingBuffer - a bounded multi-producer/multi-consumer buffer built from one lock and two condition variables.
+
+The demo in conditions.py guards an unbounded list with a single Condition. Two conditions sharing one lock (see the
+pydoc of conditions.py on passing a lock in) let every thread wait for exactly the state change it cares about:
+
+*   producers wait on `not_full` while the buffer is full, consumers wake them up after taking items out
+*   consumers wait on `not_empty` while the buffer is empty, producers wake them up after adding items
+
+Bounding the buffer is what gives backpressure: producers that run ahead of the consumers block instead of growing the
+buffer forever. The items live in a fixed size list used as a ring (the read position wraps around), so adding and
+removing items never reallocates or shifts memory.
+
+put_many() and get_many() move as many items as fit per lock acquisition, instead of paying for the lock and a
+notify per item. Every blocking method takes a timeout, raising queue.Full / queue.Empty like queue.Queue does.
+"""
+import queue
+import threading
+import time
+
+from langauge.percentiles import percentile
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._head = 0          # index of the oldest item
+        self._count = 0
+        lock = threading.Lock()
+        self._not_full = threading.Condition(lock)
+        self._not_empty = threading.Condition(lock)
+
+    def __len__(self):
+        return self._count
+
+    def _append(self, item):
+        self._slots[(self._head + self._count) % self.capacity] = item
+        self._count += 1
+
+    def _popleft(self):
+        item = self._slots[self._head]
+        self._slots[self._head] = None      # do not keep consumed items alive
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        return item
+
+    def put(self, item, timeout=None):
+        with self._not_full:
+            # wait_for() re-checks the predicate after every wake up: another producer may have filled the free slot
+            if not self._not_full.wait_for(lambda: self._count < self.capacity, timeout):
+                raise queue.Full
+            self._append(item)
+            self._not_empty.notify()
+
+    def put_many(self, items, timeout=None):
+        """
+        Put all items, blocking whenever the buffer is full. Returns the number of items put, which is less than
+        len(items) only if `timeout` seconds passed first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = 0
+        while done < len(items):
+            with self._not_full:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self._not_full.wait_for(lambda: self._count < self.capacity, remaining):
+                    return done
+                batch = min(len(items) - done, self.capacity - self._count)
+                for item in items[done:done + batch]:
+                    self._append(item)
+                done += batch
+                self._not_empty.notify(batch)
+        return done
+
+    def get(self, timeout=None):
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._count, timeout):
+                raise queue.Empty
+            item = self._popleft()
+            self._not_full.notify()
+            return item
+
+    def get_many(self, max_items, timeout=None):
+        """Wait for at least one item and return up to max_items of them as a list"""
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._count, timeout):
+                raise queue.Empty
+            items = [self._popleft() for _ in range(min(max_items, self._count))]
+            self._not_full.notify(len(items))
+            return items
+
+
+_STOP = object()
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return tuple(percentile(samples, fraction) for fraction in (0.5, 0.95, 0.99))
+
+
+def run_benchmark(producers=2, consumers=2, items=100000, capacity=1024, batch=1):
+    """
+    `producers` threads push `items` items each through a RingBuffer to `consumers` threads, `batch` items per call.
+    Returns (items/sec, producer wait percentiles, consumer wait percentiles), wait times being the seconds spent in one
+    put/get call
+    """
+    buffer = RingBuffer(capacity)
+    producer_waits, consumer_waits = [], []
+
+    def produce():
+        waits = []
+        for start in range(0, items, batch):
+            chunk = list(range(start, min(start + batch, items)))
+            began = time.perf_counter()
+            if batch == 1:
+                buffer.put(chunk[0])
+            else:
+                buffer.put_many(chunk)
+            waits.append(time.perf_counter() - began)
+        producer_waits.extend(waits)
+
+    def consume():
+        waits = []
+        while True:
+            began = time.perf_counter()
+            got = [buffer.get()] if batch == 1 else buffer.get_many(batch)
+            waits.append(time.perf_counter() - began)
+            if got[-1] is _STOP:
+                # a batch may hold several stop markers, hand back the ones meant for other consumers
+                extra = sum(1 for item in got if item is _STOP) - 1
+                if extra:
+                    buffer.put_many([_STOP] * extra)
+                break
+        consumer_waits.extend(waits)
+
+    producer_threads = [threading.Thread(target=produce) for _ in range(producers)]
+    consumer_threads = [threading.Thread(target=consume) for _ in range(consumers)]
+
+    start = time.perf_counter()
+    for thread in producer_threads + consumer_threads:
+        thread.start()
+    for thread in producer_threads:
+        thread.join()
+    buffer.put_many([_STOP] * consumers)
+    for thread in consumer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return producers * items / elapsed, _percentiles(producer_waits), _percentiles(consumer_waits)
+
+
+def benchmark():
+    print('{:>2} {:>2} {:>5}  {:>12}  {:>26}  {:>26}'.format('P', 'C', 'batch', 'items/s', 'put wait p50/p95/p99 (us)',
+                                                             'get wait p50/p95/p99 (us)'))
+    for producers, consumers in [(1, 1), (2, 2), (4, 4), (4, 1), (1, 4)]:
+        for batch in (1, 64):
+            rate, put_waits, get_waits = run_benchmark(producers, consumers, items=50000, batch=batch)
+            print('{:>2} {:>2} {:>5}  {:>12,.0f}  {:>26}  {:>26}'.format(
+                producers, consumers, batch, rate,
+                '/'.join('{:.0f}'.format(w * 1e6) for w in put_waits),
+                '/'.join('{:.0f}'.format(w * 1e6) for w in get_waits)))
+
+
+def demo():
+    buffer = RingBuffer(3)
+    print(buffer.put_many([1, 2, 3, 4], timeout=0.1), 'of 4 items fit in a buffer of 3')
+    print(buffer.get_many(10))
+    try:
+        buffer.get(timeout=0.1)
+    except queue.Empty:
+        print('Empty buffer, get() timed out')
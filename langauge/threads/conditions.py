@@ -15,30 +15,47 @@ state call wait() repeatedly until they see the desired state, while threads tha
 that it could possibly be a desired state for one of the waiters.
 """
 
-from threading import Condition
+from threading import Condition, Thread
+
+from langauge.threads.bounded_buffer import RingBuffer
 
 
 def demo():
     cv = Condition()
-
-    num = 0
     nums = []
-
-    while True:
-
-        with cv:
-            num += 1
-            nums.append(num)
-            print('Pushed - ', num)
-            # By default, wake up one thread waiting on this condition, if any. If the calling thread has not acquired the lock when this method is called, a RuntimeError is raised.
-            # This method wakes up at most n of the threads waiting for the condition variable; it is a no-op if no threads are waiting.
-            # Note: an awakened thread does not actually return from its wait() call until it can reacquire the lock. Since notify() does not release the lock, its caller should.
-            cv.notify()
-
-        with cv:
-            while not nums:
-                # Wait until notified or until a timeout occurs. If the calling thread has not acquired the lock when this method is called, a RuntimeError is raised.
-                # This method releases the underlying lock, and then blocks until it is awakened by a notify() or notify_all() call for the same condition variable in
-                # another thread, or until the optional timeout occurs. Once awakened or timed out, it re-acquires the lock and returns.
-                cv.wait()
-            print('Popped - ', nums.pop())
+    count = 10
+
+    def producer():
+        for num in range(1, count + 1):
+            with cv:
+                nums.append(num)
+                print('Pushed - ', num)
+                # By default, wake up one thread waiting on this condition, if any. If the calling thread has not acquired the lock when this method is called, a RuntimeError is raised.
+                # This method wakes up at most n of the threads waiting for the condition variable; it is a no-op if no threads are waiting.
+                # Note: an awakened thread does not actually return from its wait() call until it can reacquire the lock. Since notify() does not release the lock, its caller should.
+                cv.notify()
+
+    def consumer():
+        for _ in range(count):
+            with cv:
+                while not nums:
+                    # Wait until notified or until a timeout occurs. If the calling thread has not acquired the lock when this method is called, a RuntimeError is raised.
+                    # This method releases the underlying lock, and then blocks until it is awakened by a notify() or notify_all() call for the same condition variable in
+                    # another thread, or until the optional timeout occurs. Once awakened or timed out, it re-acquires the lock and returns.
+                    cv.wait()
+                print('Popped - ', nums.pop(0))
+
+    # the producer and the consumer run in their own threads, so pushes and pops actually overlap
+    threads = [Thread(target=consumer), Thread(target=producer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The list above is unbounded: a producer faster than its consumer keeps growing it. RingBuffer uses a not-full and a
+    # not-empty condition sharing one lock, so producers block while it is full (see langauge/threads/bounded_buffer.py)
+    buffer = RingBuffer(capacity=2)
+    consumer_thread = Thread(target=lambda: print('Popped in bulk - ', [buffer.get() for _ in range(count)]))
+    consumer_thread.start()
+    buffer.put_many(list(range(1, count + 1)))
+    consumer_thread.join()
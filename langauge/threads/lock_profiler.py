@@ -0,0 +1,266 @@
+"""
+Lock profiling - which lock, taken where, makes threads wait, and for how long.
+
+A program slowed down by lock contention shows no error, only threads that spend their time waiting. ProfiledLock
+wraps a Lock or an RLock (ProfiledRWLock an RWLock, see rw_lock.py) and can replace it without changing the code using
+it. For every acquisition it records, per call site (file, line and function of the `with lock:` or acquire() call):
+
+*   acquires: how many times the lock was taken there
+*   contended: how many of those found the lock already taken (a non-blocking attempt is made first to find out)
+*   wait: the time spent waiting for the lock, total and maximum
+*   hold: the time the lock was held from there, total and maximum
+
+Long waits at a call site point at the contention; long holds point at the code causing it. LockProfiler collects the
+records of any number of locks (the module level `profiler` by default), and report() ranks the call sites.
+
+A ProfiledLock also works as the lock of a threading.Condition: wait() releases it and takes it back through the same
+private methods a Lock or RLock has, and the time spent taking it back after being notified counts as a wait. For a
+ProfiledRWLock, upgrade() / downgrade() (and `with lock.upgraded():`) are profiled as the 'upgrade' mode.
+
+The profiling itself costs a few microseconds per acquisition (timing, the call site lookup, and a short internal lock
+to update the counters), so use it to find hotspots rather than leave it on in production.
+"""
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from langauge.threads.rw_lock import RWLock
+
+
+def _call_site():
+    # 0 is this function, 1 the acquire() / __enter__() of the wrapper, 2 the code taking the lock - or a Condition
+    # taking it on behalf of the code using the Condition, whose frame is then further up
+    frame = sys._getframe(2)
+    while frame.f_back is not None and frame.f_code.co_filename == threading.__file__:
+        frame = frame.f_back
+    return '{}:{} {}()'.format(os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+
+def _new_site():
+    return {'acquires': 0, 'contended': 0, 'wait': 0.0, 'max_wait': 0.0, 'hold': 0.0, 'max_hold': 0.0}
+
+
+class LockProfiler:
+    def __init__(self):
+        self._sites = defaultdict(_new_site)
+        self._lock = threading.Lock()
+
+    def record(self, key, waited, held, contended):
+        with self._lock:
+            site = self._sites[key]
+            site['acquires'] += 1
+            site['contended'] += contended
+            site['wait'] += waited
+            site['max_wait'] = max(site['max_wait'], waited)
+            site['hold'] += held
+            site['max_hold'] = max(site['max_hold'], held)
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+
+    def report(self, sort='wait', top=10):
+        """The `top` call sites with the most `sort` ('wait', 'hold', 'contended', ...), as a list of dicts"""
+        with self._lock:
+            rows = [dict(site, lock=lock, mode=mode, site=where) for (lock, mode, where), site in self._sites.items()]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:top]
+
+    def print_report(self, sort='wait', top=10):
+        print('{:<28} {:<7} {:<40} {:>9} {:>10} {:>10} {:>10}'.format('lock', 'mode', 'call site', 'acquires',
+                                                                     'contended', 'wait ms', 'hold ms'))
+        for row in self.report(sort, top):
+            print('{lock:<28} {mode:<7} {site:<40} {acquires:>9} {contended:>10} {wait_ms:>10.1f} {hold_ms:>10.1f}'
+                  .format(wait_ms=row['wait'] * 1000, hold_ms=row['hold'] * 1000, **row))
+
+
+profiler = LockProfiler()
+
+
+class _ProfiledBase:
+    def __init__(self, lock, name, profiler_):
+        self._lock = lock
+        self.name = name or '{}@{:x}'.format(type(lock).__name__, id(lock))
+        self.profiler = profiler_ or profiler
+        # acquisitions not released yet: exclusive ones have one holder at a time (which an RLock may nest), and a Lock
+        # may be released by another thread than the one which acquired it. Reads are held by many threads at once
+        self._held = []
+        self._reads = threading.local()
+
+    def _holds(self, mode):
+        if mode != 'read':
+            return self._held
+        try:
+            return self._reads.stack
+        except AttributeError:
+            stack = self._reads.stack = []
+            return stack
+
+    def _acquire(self, acquire, mode, site, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        contended = not acquire(False)
+        if contended:
+            if not blocking or not acquire(True, timeout):
+                self.profiler.record((self.name, mode, site), time.perf_counter() - start, 0.0, True)
+                return False
+        now = time.perf_counter()
+        self._holds(mode).append((site, now - start, contended, now, mode))
+        return True
+
+    def _release(self, release, mode):
+        holds = self._holds(mode)
+        if mode == 'upgr' and holds and holds[-1][4] == 'upgrade':
+            self._end_hold(holds.pop())     # released while still upgraded: the upgrade ends as well
+        hold = holds.pop()
+        release()
+        self._end_hold(hold)
+
+    def _end_hold(self, hold):
+        site, waited, contended, acquired, mode = hold
+        self.profiler.record((self.name, mode, site), waited, time.perf_counter() - acquired, contended)
+
+
+class ProfiledLock(_ProfiledBase):
+    """Drop-in for a Lock or an RLock (a new Lock unless `lock` is given)"""
+
+    def __init__(self, lock=None, name=None, profiler=None):
+        super().__init__(threading.Lock() if lock is None else lock, name, profiler)
+
+    def acquire(self, blocking=True, timeout=-1):
+        return self._acquire(self._lock.acquire, 'lock', _call_site(), blocking, timeout)
+
+    def release(self):
+        self._release(self._lock.release, 'lock')
+
+    def __enter__(self):
+        return self._acquire(self._lock.acquire, 'lock', _call_site())
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    # --- used by threading.Condition, which calls them on its lock when they exist
+
+    def _is_owned(self):
+        if hasattr(self._lock, '_is_owned'):        # RLock
+            return self._lock._is_owned()
+        if self._lock.acquire(False):               # Lock: the same test Condition makes without _is_owned()
+            self._lock.release()
+            return False
+        return True
+
+    def _release_save(self):
+        """Condition.wait(): release the lock completely (an RLock may be held several times), ending its holds"""
+        holds, self._held = self._held, []
+        if hasattr(self._lock, '_release_save'):
+            state = self._lock._release_save()
+        else:
+            self._lock.release()
+            state = None
+        for hold in reversed(holds):
+            self._end_hold(hold)
+        return state, [hold[0] for hold in holds]
+
+    def _acquire_restore(self, saved):
+        """Take the lock back after Condition.wait(), recording the time it took as a wait at the wait() call site"""
+        state, sites = saved
+        start = time.perf_counter()
+        if hasattr(self._lock, '_acquire_restore'):
+            self._lock._acquire_restore(state)
+        else:
+            self._lock.acquire()
+        now = time.perf_counter()
+        for i, site in enumerate(sites):
+            waited = now - start if i == len(sites) - 1 else 0.0     # counted once, on the innermost hold
+            self._held.append((site, waited, False, now, 'lock'))
+
+
+class _ProfiledGuard:
+    __slots__ = ('_owner', '_mode', '_acquire', '_release')
+
+    def __init__(self, owner, mode, acquire, release):
+        self._owner, self._mode, self._acquire, self._release = owner, mode, acquire, release
+
+    def __enter__(self):
+        self._owner._acquire(self._acquire, self._mode, _call_site())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._owner._release(self._release, self._mode)
+
+
+class ProfiledRWLock(_ProfiledBase):
+    """Drop-in for an RWLock, profiling read, write and upgradable acquisitions separately"""
+
+    def __init__(self, lock=None, name=None, profiler=None):
+        super().__init__(RWLock() if lock is None else lock, name, profiler)
+
+    def acquire_read(self, blocking=True, timeout=-1):
+        return self._acquire(self._lock.acquire_read, 'read', _call_site(), blocking, timeout)
+
+    def release_read(self):
+        self._release(self._lock.release_read, 'read')
+
+    def acquire_write(self, blocking=True, timeout=-1):
+        return self._acquire(self._lock.acquire_write, 'write', _call_site(), blocking, timeout)
+
+    def release_write(self):
+        self._release(self._lock.release_write, 'write')
+
+    def acquire_upgradable(self, blocking=True, timeout=-1):
+        return self._acquire(self._lock.acquire_upgradable, 'upgr', _call_site(), blocking, timeout)
+
+    def release_upgradable(self):
+        self._release(self._lock.release_upgradable, 'upgr')
+
+    def upgrade(self, blocking=True, timeout=-1):
+        return self._acquire(self._lock.upgrade, 'upgrade', _call_site(), blocking, timeout)
+
+    def downgrade(self):
+        self._release(self._lock.downgrade, 'upgrade')
+
+    def read(self):
+        return _ProfiledGuard(self, 'read', self._lock.acquire_read, self._lock.release_read)
+
+    def write(self):
+        return _ProfiledGuard(self, 'write', self._lock.acquire_write, self._lock.release_write)
+
+    def upgradable(self):
+        return _ProfiledGuard(self, 'upgr', self._lock.acquire_upgradable, self._lock.release_upgradable)
+
+    def upgraded(self):
+        return _ProfiledGuard(self, 'upgrade', self._lock.upgrade, self._lock.downgrade)
+
+
+def demo():
+    from langauge.threads.sharded_counter import ClassLockCutlery
+
+    # the Cutlery class lock of race_condition.py under the profiler: every change() of every bot goes through it
+    class ProfiledClassLockCutlery(ClassLockCutlery):
+        lock = ProfiledLock(name='ClassLockCutlery.lock')
+
+    kitchen = ProfiledClassLockCutlery(knives=100, forks=100)
+
+    def bot():
+        cutlery = ProfiledClassLockCutlery()
+        for _ in range(5000):
+            kitchen.give(to=cutlery, knives=4, forks=4)
+            cutlery.give(to=kitchen, knives=4, forks=4)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)         # switch threads often, as they would with more cores and more work
+    try:
+        threads = [threading.Thread(target=bot) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    profiler.print_report()
+    profiler.reset()
@@ -24,11 +24,21 @@ finally:
     some_lock.release()
 
 Currently, Lock, RLock, Condition, Semaphore, and BoundedSemaphore objects may be used as with statement context managers.
+
+-----
+
+* A Lock lets one thread in at a time, readers included. RWLock (see rw_lock.py) lets any number of readers in at once,
+or a single writer. To find out which locks threads wait for, and where, wrap them in a ProfiledLock (see
+lock_profiler.py).
 """
 import threading
 import time
 from threading import Lock, RLock, Thread
 
+from langauge.threads.lock_profiler import ProfiledLock, profiler
+from langauge.threads.object_pool import ThreadLocalPool
+from langauge.threads.rw_lock import RWLock
+
 
 class ThreadLocal:
     """
@@ -46,17 +56,41 @@ class ThreadLocal:
         print('X is {} in thread local data for thread {}'.format(self.thread_local_data.x, threading.current_thread().getName()))
 
 
+class ThreadLocalBuffers:
+    """
+    The same idea for objects that are expensive to create: ThreadLocalPool (see object_pool.py) keeps a free list per
+    thread in a threading.local, so each thread reuses its own buffers instead of allocating new ones.
+    """
+    buffers = ThreadLocalPool(lambda: bytearray(64 * 1024), max_per_thread=2)
+
+    def fill_and_print(self, value):
+        with self.buffers.borrow() as buffer:
+            buffer[0] = value
+            print('Buffer {:x} holds {} for thread {}'.format(id(buffer), buffer[0], threading.current_thread().getName()))
+
+
 def demo():
     lock_demo()
 
     print('\nR Lock demo begins ... ')
     r_lock_demo()
 
+    print('\nRW Lock demo begins ... ')
+    rw_lock_demo()
+
     print('\nThread local demo begins ... ')
     thread_local_enabled_object = ThreadLocal()
     thread_local_enabled_object.add_and_print_x(1)
     Thread(target=lambda thread_local_enabled_obj, x: thread_local_enabled_obj.add_and_print_x(x), args=(thread_local_enabled_object, 1)).start()
 
+    buffers = ThreadLocalBuffers()
+    buffers.fill_and_print(1)
+    buffers.fill_and_print(2)       # same buffer as above: reused, not reallocated
+    thread = Thread(target=buffers.fill_and_print, args=(3,))
+    thread.start()
+    thread.join()
+    print('Thread local pool stats - ', buffers.buffers.stats())
+
 
 def release_lock(lock, sleep_sec):
     time.sleep(sleep_sec)
@@ -94,3 +128,28 @@ def r_lock_demo():
     r_lock.release()
     # r_lock.release()        # will raise RuntimeError: cannot release un-acquired lock
     print('RLock after 2 acquires and 2 releases = {}'.format(r_lock))
+
+
+def rw_lock_demo():
+    rw_lock = RWLock()
+    rw_lock.acquire_read()
+    rw_lock.acquire_read()      # readers do not exclude each other: this does NOT block
+    print('RWLock after 2 read acquires = {}'.format(rw_lock))
+    # a writer would wait here until both readers are gone
+    print('Write lock acquired while read = {}'.format(rw_lock.acquire_write(blocking=False)))
+    rw_lock.release_read()
+    rw_lock.release_read()
+    with rw_lock.write():
+        print('RWLock while writing = {}'.format(rw_lock))
+
+    lock = ProfiledLock(name='demo lock')       # behaves like Lock(), recording who waits for it and for how long
+    threads = [Thread(target=release_lock, args=(lock, 0.1)) for _ in range(2)]
+    for thread in threads:
+        lock.acquire()
+        thread.start()
+    lock.acquire()
+    lock.release()
+    for thread in threads:
+        thread.join()
+    profiler.print_report()
+    profiler.reset()
@@ -0,0 +1,184 @@
+"""
+ThreadLocalPool - per thread free lists of expensive objects, reused instead of reallocated.
+
+ThreadLocal in locks.py keeps a scalar per thread in a threading.local. The same idea keeps objects that are
+expensive to create - large buffers, compiled parsers, connections - for reuse: each thread gets a free list of its
+own, so borrowing and returning an object never takes a lock, and an object is only ever used by one thread at a time.
+
+    def zero(buffer):
+        buffer[:] = bytes(len(buffer))      # keeps its size, unlike buffer.clear()
+
+    pool = ThreadLocalPool(lambda: bytearray(1 << 20), reset=zero)
+
+    with pool.borrow() as buffer:
+        ...
+
+*   `factory()` creates a new object when the free list of the thread is empty (a miss); otherwise a pooled one is
+    handed out (a hit)
+*   `reset(obj)` runs when an object is returned, so the next borrower gets it in a clean state. If reset raises, the
+    object is dropped rather than pooled
+*   at most `max_per_thread` objects are kept per thread; objects returned beyond that are closed and dropped
+*   `close(obj)` runs on every object dropped: beyond max_per_thread, on clear(), and when its thread exits. The
+    per thread state lives in the threading.local, which Python clears when the thread ends; a weakref.finalize
+    callback then closes the objects the thread still had pooled
+
+stats() sums the hits, misses and dropped objects of every thread. The counters are per thread too, so
+counting costs no lock either; when a thread exits, its counts are added to the totals of the threads gone.
+"""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+
+def _close_all(objects, close):
+    while objects:
+        obj = objects.pop()
+        if close is not None:
+            close(obj)
+
+
+def _thread_exited(objects, close, counts, live_counts, retired, lock):
+    """Finalizer of a thread's state: close its pooled objects and move its counts into `retired`"""
+    _close_all(objects, close)
+    with lock:
+        live_counts.pop(id(counts), None)
+        for key, value in counts.items():
+            retired[key] += value
+        retired['threads'] += 1
+
+
+class _ThreadState:
+    """The free list and counters of one thread, kept in the pool's threading.local"""
+    __slots__ = ('free', 'counts', '__weakref__')
+
+    def __init__(self):
+        self.free = []
+        self.counts = {'hits': 0, 'misses': 0, 'dropped': 0}
+
+
+class ThreadLocalPool:
+    def __init__(self, factory, max_per_thread=4, reset=None, close=None):
+        self.factory = factory
+        self.max_per_thread = max_per_thread
+        self.reset = reset
+        self.close = close
+        self._local = threading.local()
+        self._live_counts = {}      # id -> counts of the threads using the pool
+        self._retired = {'hits': 0, 'misses': 0, 'dropped': 0, 'threads': 0}     # of the threads gone
+        self._lock = threading.RLock()  # finalizers may run from garbage collection, in a thread holding the lock
+
+    def _state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = _ThreadState()
+            with self._lock:
+                self._live_counts[id(state.counts)] = state.counts
+            # runs when the thread exits (or the pool is garbage collected), closing the objects still pooled. The
+            # callback must not reference the pool, or the pool would live as long as the thread
+            weakref.finalize(state, _thread_exited, state.free, self.close, state.counts, self._live_counts,
+                             self._retired, self._lock)
+            return state
+
+    def acquire(self):
+        state = self._state()
+        if state.free:
+            state.counts['hits'] += 1
+            return state.free.pop()
+        state.counts['misses'] += 1
+        return self.factory()
+
+    def release(self, obj):
+        state = self._state()
+        if len(state.free) < self.max_per_thread:
+            try:
+                if self.reset is not None:
+                    self.reset(obj)
+            except Exception:
+                pass                # not reusable: dropped below
+            else:
+                state.free.append(obj)
+                return
+        state.counts['dropped'] += 1
+        if self.close is not None:
+            self.close(obj)
+
+    @contextmanager
+    def borrow(self):
+        obj = self.acquire()
+        try:
+            yield obj
+        finally:
+            self.release(obj)
+
+    def clear(self):
+        """Close and drop the objects pooled by the calling thread"""
+        _close_all(self._state().free, self.close)
+
+    def stats(self):
+        with self._lock:
+            counts = list(self._live_counts.values())
+            totals = dict(self._retired)
+        for thread_counts in counts:
+            for key, value in thread_counts.items():
+                totals[key] += value
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        totals['threads'] += len(counts)
+        return totals
+
+
+# ----- Benchmark
+
+def benchmark(threads=8, iterations=20000, buffer_size=256 * 1024):
+    """Each iteration needs a scratch buffer of `buffer_size` bytes"""
+    allocations = [0]
+
+    def new_buffer():
+        allocations[0] += 1         # only an estimate under contention, fine for a benchmark
+        return bytearray(buffer_size)
+
+    pool = ThreadLocalPool(new_buffer, max_per_thread=2)
+
+    def fresh():
+        for i in range(iterations):
+            buffer = new_buffer()
+            buffer[i % buffer_size] = 1
+
+    def pooled():
+        for i in range(iterations):
+            with pool.borrow() as buffer:
+                buffer[i % buffer_size] = 1
+
+    print('{} threads x {} iterations, {} KB buffer each'.format(threads, iterations, buffer_size // 1024))
+    for name, work in [('new buffer per iteration', fresh), ('ThreadLocalPool', pooled)]:
+        allocations[0] = 0
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        print('{:<26} {:>7.2f}s  {:>8} allocations'.format(name, elapsed, allocations[0]))
+    print(pool.stats())
+
+
+def demo():
+    pool = ThreadLocalPool(list, max_per_thread=1, reset=list.clear, close=lambda obj: print('closing', obj))
+
+    def work(name):
+        with pool.borrow() as scratch:
+            scratch.append(name)
+            with pool.borrow() as second:       # the first one is in use: a second object is created
+                second.append(name + ' inner')
+        # both returned, one is kept for the next borrow() of this thread, the other one is closed
+
+    thread = threading.Thread(target=work, args=('thread',))
+    thread.start()
+    thread.join()               # the thread's pooled object is closed as the thread exits
+    work('main')
+    with pool.borrow() as reused:
+        print('reused the object kept by the main thread:', reused)
+    print(pool.stats())
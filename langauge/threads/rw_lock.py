@@ -0,0 +1,243 @@
+"""
+RWLock - a reader-writer lock: any number of readers at once, or a single writer.
+
+A Lock (see locks.py) serializes everyone. Shared state that is read far more often than it is written - a cache, a
+configuration, a routing table - only needs writers to be exclusive: readers do not disturb each other. RWLock allows
+that, and adds:
+
+*   writer preference: once a writer waits, new readers wait behind it. With a steady stream of readers, a lock that
+    always let readers in would make writers wait forever
+*   upgradable reads: one thread at a time may hold the lock in upgradable mode. It reads alongside the plain readers
+    and excludes writers, and can upgrade() to write access (waiting for the plain readers to leave) without
+    releasing the lock in between. This is the read-check-then-write pattern ("look the key up, compute and store it
+    when missing") without a window in which another writer could store it first. Two plain readers both trying to
+    upgrade would deadlock, waiting for each other to leave, which is why only one upgradable reader is allowed
+
+    with lock.read():
+        value = cache.get(key)
+
+    with lock.upgradable():
+        if key not in cache:
+            with lock.upgraded():
+                cache[key] = compute(key)
+
+The lock is not reentrant: a thread holding it must not acquire it again (in particular, a reader acquiring the read
+lock a second time deadlocks as soon as a writer waits in between). Every acquire method takes `blocking` and
+`timeout` like Lock.acquire().
+
+Under the GIL, readers only truly run at the same time while their critical section releases the GIL (I/O, time.sleep,
+C extensions); for a few dict lookups a plain Lock is just as fast. See benchmark().
+"""
+import threading
+import time
+
+
+class _Guard:
+    __slots__ = ('_acquire', '_release')
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._release()
+
+
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None             # ident of the thread holding the write lock
+        self._upgradable = None         # ident of the thread holding the upgradable read lock
+        self._waiting_writers = 0
+
+    def _wait(self, predicate, blocking, timeout):
+        if predicate():
+            return True
+        if not blocking:
+            return False
+        return self._cond.wait_for(predicate, None if timeout < 0 else timeout)
+
+    # --- read
+
+    def acquire_read(self, blocking=True, timeout=-1):
+        with self._cond:
+            if not self._wait(lambda: self._writer is None and not self._waiting_writers, blocking, timeout):
+                return False
+            self._readers += 1
+            return True
+
+    def release_read(self):
+        with self._cond:
+            if self._readers <= 0:
+                raise RuntimeError('release_read() of an RWLock not held for reading')
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    # --- write
+
+    def acquire_write(self, blocking=True, timeout=-1):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                acquired = self._wait(lambda: self._writer is None and self._upgradable is None and not self._readers,
+                                      blocking, timeout)
+            finally:
+                self._waiting_writers -= 1
+            if not acquired:
+                self._cond.notify_all()     # readers held back by this writer may go
+                return False
+            self._writer = threading.get_ident()
+            return True
+
+    def release_write(self):
+        with self._cond:
+            if self._writer != threading.get_ident() or self._upgradable == self._writer:
+                raise RuntimeError('release_write() of an RWLock not held for writing by this thread')
+            self._writer = None
+            self._cond.notify_all()
+
+    # --- upgradable read
+
+    def acquire_upgradable(self, blocking=True, timeout=-1):
+        with self._cond:
+            if not self._wait(lambda: self._writer is None and self._upgradable is None and not self._waiting_writers,
+                              blocking, timeout):
+                return False
+            self._upgradable = threading.get_ident()
+            return True
+
+    def release_upgradable(self):
+        with self._cond:
+            if self._upgradable != threading.get_ident():
+                raise RuntimeError('release_upgradable() of an RWLock not held upgradable by this thread')
+            if self._writer == self._upgradable:        # still upgraded
+                self._writer = None
+            self._upgradable = None
+            self._cond.notify_all()
+
+    def upgrade(self, blocking=True, timeout=-1):
+        """Turn the upgradable read lock held by this thread into the write lock, once the plain readers are gone"""
+        with self._cond:
+            me = threading.get_ident()
+            if self._upgradable != me:
+                raise RuntimeError('upgrade() needs the upgradable read lock')
+            if self._writer == me:
+                raise RuntimeError('already upgraded')
+            self._waiting_writers += 1      # no new readers meanwhile: writer preference
+            try:
+                acquired = self._wait(lambda: not self._readers, blocking, timeout)
+            finally:
+                self._waiting_writers -= 1
+            if not acquired:
+                self._cond.notify_all()
+                return False
+            self._writer = me
+            return True
+
+    def downgrade(self):
+        """Back from upgrade() to the upgradable read lock, letting readers in again"""
+        with self._cond:
+            if self._writer != threading.get_ident() or self._upgradable != self._writer:
+                raise RuntimeError('downgrade() needs an upgraded lock')
+            self._writer = None
+            self._cond.notify_all()
+
+    # --- with statements
+
+    def read(self):
+        return _Guard(self.acquire_read, self.release_read)
+
+    def write(self):
+        return _Guard(self.acquire_write, self.release_write)
+
+    def upgradable(self):
+        return _Guard(self.acquire_upgradable, self.release_upgradable)
+
+    def upgraded(self):
+        return _Guard(self.upgrade, self.downgrade)
+
+    def __repr__(self):
+        return '<RWLock readers={} writer={} upgradable={} waiting writers={}>'.format(
+            self._readers, self._writer, self._upgradable, self._waiting_writers)
+
+
+# ----- Benchmark
+
+class _LockAsRW:
+    """A plain Lock behind the read() / write() interface, for comparison"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def read(self):
+        return self._lock
+
+    write = read
+
+
+def benchmark(readers=8, duration=1.0, read_io=0.0005):
+    """
+    Readers look a key up while holding the lock, waiting `read_io` seconds (e.g. to validate an entry against disk,
+    releasing the GIL); one writer updates the table every millisecond
+    """
+    def run(lock):
+        table = {i: i for i in range(100)}
+        stop = threading.Event()
+        counts = [0] * (readers + 1)
+
+        def reader(slot):
+            while not stop.is_set():
+                with lock.read():
+                    table.get(slot)
+                    time.sleep(read_io)
+                counts[slot] += 1
+
+        def writer():
+            while not stop.is_set():
+                with lock.write():
+                    table[0] += 1
+                counts[readers] += 1
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return sum(counts[:readers]) / duration, counts[readers] / duration
+
+    print('{} readers holding the lock for {} ms, 1 writer'.format(readers, read_io * 1000))
+    for name, lock in [('Lock', _LockAsRW()), ('RWLock', RWLock())]:
+        reads, writes = run(lock)
+        print('{:<8} {:>8,.0f} reads/s {:>6,.0f} writes/s'.format(name, reads, writes))
+
+
+def demo():
+    lock = RWLock()
+    cache = {}
+
+    def lookup(key):
+        with lock.read():
+            if key in cache:
+                return cache[key]
+        with lock.upgradable():
+            if key not in cache:            # another thread may have stored it since the read lock was released
+                with lock.upgraded():
+                    cache[key] = key * key
+            return cache[key]
+
+    threads = [threading.Thread(target=lookup, args=(i % 3,)) for i in range(9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(cache, lock)
@@ -0,0 +1,223 @@
+"""
+Sharded counters - an alternative to guarding a shared counter with a single lock (see race_condition.py).
+
+The race condition fix in race_condition.py puts one class level Lock around Cutlery.change(), which every ThreadBot
+has to take for every task, so the bots spend their time queueing up for that one lock. A sharded counter gives every
+thread its own private accumulator (a "shard") and only merges the shards when the value is read:
+
+*   writes never contend: a shard is only ever written by the thread that owns it, so no lock is needed
+*   reads are more expensive: they sum every shard. This suits counters that are updated far more often than read
+
+Consistent snapshots: several fields (knives and forks) changed by one call must never be seen half applied. Each
+shard has a version number, made odd by its owner while a change is being applied and even again afterwards (a
+"seqlock"). A reader copies a shard and retries if the version was odd or moved during the copy, so every shard is read
+as of a point between two whole changes. While writers are still running the shards are read one after the other, so
+the totals are a sum of per-thread consistent states; once the writers are done, they are exact.
+
+When a thread exits, its shard is merged into the base values and dropped, so threads started per task do not make
+memory and snapshot() grow with every thread that ever existed. As in object_pool.py, a weakref.finalize callback does
+that: the thread's threading.local holds a token next to the shard, and is cleared when the thread ends.
+"""
+import sys
+import threading
+import time
+import weakref
+
+
+class _Shard:
+    __slots__ = ('version', 'values')
+
+    def __init__(self, size):
+        self.version = 0
+        self.values = [0] * size
+
+
+class _ShardToken:
+    """Lives in the threading.local next to the shard: its finalizer runs when the owning thread exits"""
+    __slots__ = ('__weakref__',)
+
+
+def _retire(shard, base, shards, lock):
+    """Merge the shard of a thread gone into the base values, the callback must not reference the inventory"""
+    with lock:
+        for i, value in enumerate(shard.values):
+            base[i] += value
+        del shards[id(shard)]
+
+
+class ShardedInventory:
+    def __init__(self, **initial):
+        self._fields = tuple(initial)
+        self._base = list(initial.values())
+        self._shards = {}           # id -> shard of every live thread
+        # taken once per thread to register its shard, when it exits, and by snapshot(). Reentrant, as finalizers may
+        # run from garbage collection in a thread already holding it
+        self._shards_lock = threading.RLock()
+        self._local = threading.local()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(len(self._fields))
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            token = self._local.token = _ShardToken()
+            weakref.finalize(token, _retire, shard, self._base, self._shards, self._shards_lock)
+            self._local.shard = shard
+            return shard
+
+    def add(self, *deltas):
+        """Add deltas to the fields, in the order they were passed to the constructor"""
+        shard = self._shard()
+        values = shard.values
+        shard.version += 1          # odd: change in progress
+        for i, delta in enumerate(deltas):
+            values[i] += delta
+        shard.version += 1          # even: change complete
+
+    def snapshot(self):
+        with self._shards_lock:
+            totals = list(self._base)       # read together with the shards: a shard is merged and dropped at once
+            shards = list(self._shards.values())
+
+        for shard in shards:
+            while True:
+                version = shard.version
+                values = list(shard.values)
+                if version % 2 == 0 and shard.version == version:
+                    break
+                time.sleep(0)       # a change is being applied, let its thread finish it
+            for i, value in enumerate(values):
+                totals[i] += value
+        return dict(zip(self._fields, totals))
+
+    def __getattr__(self, name):
+        if name in self.__dict__.get('_fields', ()):
+            return self.snapshot()[name]
+        raise AttributeError(name)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join('{}={}'.format(k, v) for k, v in self.snapshot().items()))
+
+
+# ----- Cutlery variants of race_condition.py, compared by benchmark()
+
+class Cutlery:
+    """No locking at all: concurrent changes may be lost"""
+
+    def __init__(self, knives=0, forks=0):
+        self.knives = knives
+        self.forks = forks
+
+    def give(self, to, knives=0, forks=0):
+        self.change(-knives, -forks)
+        to.change(knives, forks)
+
+    def change(self, knives, forks):
+        self.knives += knives
+        self.forks += forks
+
+    def snapshot(self):
+        return {'knives': self.knives, 'forks': self.forks}
+
+
+class ClassLockCutlery(Cutlery):
+    """The fix of race_condition.py: one lock shared by every instance"""
+    lock = threading.Lock()
+
+    def change(self, knives, forks):
+        with self.lock:
+            self.knives += knives
+            self.forks += forks
+
+
+class InstanceLockCutlery(Cutlery):
+    """A lock per instance: bots only contend on the kitchen, not on each other's cutlery"""
+
+    def __init__(self, knives=0, forks=0):
+        super().__init__(knives, forks)
+        self.lock = threading.Lock()
+
+    def change(self, knives, forks):
+        with self.lock:
+            self.knives += knives
+            self.forks += forks
+
+
+class ShardedCutlery(ShardedInventory):
+    """No lock on the hot path: every thread changes its own shard"""
+
+    def __init__(self, knives=0, forks=0):
+        super().__init__(knives=knives, forks=forks)
+
+    def give(self, to, knives=0, forks=0):
+        self.change(-knives, -forks)
+        to.change(knives, forks)
+
+    def change(self, knives, forks):
+        # add() unrolled for the two fields, this is the hot path
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        values = shard.values
+        shard.version += 1
+        values[0] += knives
+        values[1] += forks
+        shard.version += 1
+
+
+VARIANTS = [Cutlery, ClassLockCutlery, InstanceLockCutlery, ShardedCutlery]
+
+
+def run_service(cutlery_class, threads, tables):
+    """
+    The ThreadBot workload of race_condition.py: `threads` bots each take cutlery from the kitchen and give it back for
+    `tables` tables. Returns the kitchen inventory afterwards and the elapsed time, for benchmarks of lock variants
+    """
+    kitchen = cutlery_class(knives=100, forks=100)
+
+    def bot():
+        cutlery = cutlery_class()
+        for _ in range(tables):
+            kitchen.give(to=cutlery, knives=4, forks=4)
+            cutlery.give(to=kitchen, knives=4, forks=4)
+
+    bots = [threading.Thread(target=bot) for _ in range(threads)]
+    start = time.perf_counter()
+    for b in bots:
+        b.start()
+    for b in bots:
+        b.join()
+    elapsed = time.perf_counter() - start
+    return kitchen.snapshot(), elapsed
+
+
+def benchmark(thread_counts=(1, 2, 4, 8, 16), tables=20000):
+    """Each thread prepares and clears `tables` tables; the kitchen must end up with its 100 knives and forks"""
+    # a short switch interval makes the unlocked race visible even with small workloads
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        print('{:<20} {:>7} {:>14} {:>22}'.format('variant', 'threads', 'changes/s', 'kitchen after service'))
+        for threads in thread_counts:
+            for variant in VARIANTS:
+                inventory, elapsed = run_service(variant, threads, tables)
+                changes = threads * tables * 4     # 2 gives per table, 2 changes per give
+                ok = inventory == {'knives': 100, 'forks': 100}
+                print('{:<20} {:>7} {:>14,.0f} {:>14} {}'.format(variant.__name__, threads, changes / elapsed,
+                                                                  '{knives}/{forks}'.format(**inventory),
+                                                                  'ok' if ok else 'WRONG'))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def demo():
+    inventory = ShardedCutlery(knives=100, forks=100)
+    threads = [threading.Thread(target=inventory.change, args=(-1, -2)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(inventory, inventory.knives, inventory.snapshot())
@@ -2,6 +2,8 @@ import threading
 import time
 from threading import Thread
 
+from langauge.threads.worker_pool import WorkerPool
+
 
 def print_func(msg):
     print(msg, '- falling asleep for 3 seconds')
@@ -35,3 +37,10 @@ def demo():
     func_new_thread.join()
     lambda_thread.join()
     class_thread.join()
+
+    # Starting a thread per piece of work is expensive when there is a lot of it: a pool starts its threads once and
+    # hands them the work, see worker_pool.py
+    with WorkerPool(workers=2) as pool:
+        futures = [pool.submit(lambda i: print('Printing from', threading.current_thread().name, '- task', i), i)
+                   for i in range(4)]
+    print('Pool tasks done -', all(future.done() for future in futures))
@@ -0,0 +1,228 @@
+"""
+WorkerPool - a fixed set of threads running submitted functions, each worker with a deque of its own.
+
+threads.py starts a new Thread per piece of work. Starting a thread costs an OS thread creation (a stack, a kernel
+object) and tearing it down again, which dwarfs a short task. A pool starts its threads once and feeds them work.
+
+concurrent.futures.ThreadPoolExecutor feeds all of its threads from one shared queue. WorkerPool gives each worker a
+deque instead (work stealing, as in Java's ForkJoinPool):
+
+*   submit() from outside the pool deals tasks round robin over the worker deques. submit() from a task running in the
+    pool pushes onto the deque of that worker, so tasks spawning sub-tasks keep them local
+*   a worker takes work from the right (newest) end of its own deque. When it is empty, the worker steals from the left
+    (oldest) end of the other workers' deques, so the owner and the thief rarely touch the same items
+*   only when every deque is empty does a worker go to sleep on a condition variable, and submit() only touches that
+    condition's lock when a worker is actually sleeping. deque.append() / pop() / popleft() are atomic, so the deques
+    themselves need no lock
+
+submit() returns a concurrent.futures.Future, as ThreadPoolExecutor.submit() does. stats() reports, per worker, the
+tasks it ran, how many it stole and the fraction of its lifetime spent running tasks. join() (or leaving a with block)
+runs every task already submitted, including the sub-tasks those submit while join() waits, then stops the threads;
+only submit() from outside the pool is refused after join(). A task waiting for the result of another task should use
+pool.wait(future), which runs queued tasks in the meantime rather than blocking its worker.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class WorkerPool:
+    def __init__(self, workers=4, name='WorkerPool'):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self._deques = [deque() for _ in range(workers)]
+        self._stats = [{'tasks': 0, 'stolen': 0, 'busy': 0.0} for _ in range(workers)]
+        self._next = itertools.count()          # next() on a count is atomic: round robin without a lock
+        self._local = threading.local()
+        self._work = threading.Condition(threading.Lock())
+        self._sleeping = 0
+        self._shutdown = False
+        self._pending = 0                       # tasks submitted and not finished yet, queued or running
+        self._pending_lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._threads = [threading.Thread(target=self._run_worker, args=(i,), name='{}-{}'.format(name, i),
+                                          daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.join()
+
+    def submit(self, fn, *args, **kwargs):
+        worker = getattr(self._local, 'worker', None)
+        if worker is None:
+            # tasks of the pool keep submitting sub-tasks while join() waits for them
+            if self._shutdown:
+                raise RuntimeError('cannot submit to a pool that was joined')
+            worker = next(self._next) % len(self._deques)
+        future = Future()
+        with self._pending_lock:
+            self._pending += 1
+        self._deques[worker].append((future, fn, args, kwargs))
+        # a worker increments _sleeping before checking the deques a last time, so either it sees this task, or this
+        # sees it sleeping
+        if self._sleeping:
+            with self._work:
+                self._work.notify()
+        return future
+
+    def map(self, fn, *iterables):
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+
+    def _has_work(self):
+        return any(self._deques)
+
+    def _steal(self, index):
+        count = len(self._deques)
+        for offset in range(1, count):
+            try:
+                return self._deques[(index + offset) % count].popleft()
+            except IndexError:
+                pass
+        return None
+
+    def _wait_for_work(self):
+        """Sleep until there is work, return False once the pool is joined and all work is done"""
+        with self._work:
+            self._sleeping += 1
+            try:
+                while not self._has_work():
+                    if self._shutdown and not self._pending:    # no task left that could submit more
+                        return False
+                    self._work.wait()
+            finally:
+                self._sleeping -= 1
+        return True
+
+    def _run_worker(self, index):
+        self._local.worker = index
+        own, stats = self._deques[index], self._stats[index]
+        while True:
+            try:
+                task = own.pop()
+            except IndexError:
+                task = self._steal(index)
+                if task is None:
+                    if self._wait_for_work():
+                        continue
+                    return
+                stats['stolen'] += 1
+
+            self._run_task(task, stats)
+
+    def _run_task(self, task, stats):
+        future, fn, args, kwargs = task
+        if future.set_running_or_notify_cancel():
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            stats['busy'] += time.perf_counter() - start
+            stats['tasks'] += 1
+        with self._pending_lock:
+            self._pending -= 1
+            idle = not self._pending
+        if idle and self._shutdown:
+            with self._work:
+                self._work.notify_all()     # the last task is done: let the sleeping workers exit
+
+    def wait(self, future):
+        """
+        future.result(), except that a task of this pool waiting for another one runs queued tasks meanwhile, instead
+        of blocking its worker (which could deadlock a pool whose workers all wait for tasks queued behind them)
+        """
+        index = getattr(self._local, 'worker', None)
+        if index is None:
+            return future.result()
+        own, stats = self._deques[index], self._stats[index]
+        busy = stats['busy']
+        while not future.done():
+            try:
+                task = own.pop()
+            except IndexError:
+                task = self._steal(index)
+                if task is None:
+                    time.sleep(0)       # the task we wait for is running in another worker
+                    continue
+                stats['stolen'] += 1
+            self._run_task(task, stats)
+        stats['busy'] = busy            # the tasks run here count in the busy time of the task that waited
+        return future.result()
+
+    def join(self, timeout=None):
+        """Run the tasks already submitted and the sub-tasks they submit, then stop the worker threads"""
+        with self._work:
+            self._shutdown = True
+            self._work.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        lifetime = time.perf_counter() - self._started
+        return [dict(stats, queued=len(tasks), utilization=stats['busy'] / lifetime if lifetime else 0.0)
+                for stats, tasks in zip(self._stats, self._deques)]
+
+
+# ----- Benchmark
+
+def _short_task(n=50):
+    return sum(range(n))
+
+
+def benchmark(tasks=20000, workers=4):
+    def spawn_per_task():
+        threads = [threading.Thread(target=_short_task) for _ in range(tasks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def thread_pool_executor():
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_short_task) for _ in range(tasks)]
+            for future in futures:
+                future.result()
+
+    def worker_pool():
+        with WorkerPool(workers) as pool:
+            futures = [pool.submit(_short_task) for _ in range(tasks)]
+            for future in futures:
+                future.result()
+
+    print('{} short tasks, {} workers'.format(tasks, workers))
+    for name, run in [('Thread per task', spawn_per_task), ('ThreadPoolExecutor', thread_pool_executor),
+                      ('WorkerPool', worker_pool)]:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print('{:<20} {:>10,.0f} tasks/s'.format(name, tasks / elapsed))
+
+
+def demo():
+    def fib(pool, n):
+        """Sub-tasks are pushed on the deque of the worker running this one; idle workers steal them"""
+        if n < 12:
+            return n if n < 2 else fib(pool, n - 1) + fib(pool, n - 2)
+        right = pool.submit(fib, pool, n - 2)
+        return fib(pool, n - 1) + pool.wait(right)
+
+    with WorkerPool(4) as pool:
+        print('squares:', list(pool.map(lambda x: x * x, range(10))))
+        print('fib(22) =', pool.submit(fib, pool, 22).result())
+        failing = pool.submit(lambda: 1 / 0)
+        print('exception travels through the future:', repr(failing.exception()))
+        later = pool.submit(fib, pool, 22)      # still submitting sub-tasks while join() waits for it
+    print('fib(22), finished during join() =', later.result())
+    for i, stats in enumerate(pool.stats()):
+        print('worker {}: {} tasks, {} stolen, {:.0%} busy'.format(i, stats['tasks'], stats['stolen'],
+                                                                 stats['utilization']))